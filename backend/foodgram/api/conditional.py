@@ -0,0 +1,60 @@
+from calendar import timegm
+from hashlib import md5
+
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    """Отвечает 304 на условный GET, не выполняя запрос и сериализацию.
+
+    get_validators() возвращает части ETag и время последнего изменения,
+    посчитанные по версиям данных, или None, если ответ не кэшируется.
+    """
+
+    def get_validators(self):
+        return None
+
+    def anonymous_last_modified(self, *timestamps):
+        """Время изменения для ответов с флагами пользователя.
+
+        Флаги меняются без смены времени изменения данных, поэтому
+        авторизованному пользователю ответ проверяется только по ETag.
+        """
+        if self.request.user.is_authenticated:
+            return None
+        return max(filter(None, timestamps), default=None)
+
+    def conditional(self, handler, request, *args, **kwargs):
+        validators = None
+        if request.method in ('GET', 'HEAD'):
+            validators = self.get_validators()
+        if validators is None:
+            return handler(request, *args, **kwargs)
+        parts, last_modified = validators
+        etag = '"{}"'.format(md5(
+            ':'.join(map(str, (request.accepted_renderer.format, *parts)))
+            .encode()
+        ).hexdigest())
+        timestamp = None
+        if last_modified is not None:
+            timestamp = timegm(last_modified.utctimetuple())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
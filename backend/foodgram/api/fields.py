@@ -1,17 +1,103 @@
-import base64
+import binascii
+import re
 import uuid
+from base64 import b64decode
+from tempfile import NamedTemporaryFile
 
-from django.core.files.base import ContentFile
+from django.core.files import File
+from PIL import Image
 from rest_framework import serializers
 
+from foodgram.settings import (RECIPE_IMAGE_MAX_BYTES, RECIPE_IMAGE_MAX_PIXELS,
+                               RECIPE_IMAGE_MAX_SIDE)
+
+DATA_URI = re.compile(r'^data:image/(?P<subtype>[\w.+-]+);base64,')
+# Кратно 4, чтобы каждый кусок декодировался независимо
+CHUNK_SIZE = 64 * 1024
+IMAGE_FORMATS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+
+
+class Base64ImageField(serializers.FileField):
+    """Custom field - принимает картинку строкой base64 или файлом multipart.
+
+    Строка base64 декодируется по частям во временный файл, размер
+    проверяется до декодирования, а размеры в пикселях - по заголовку,
+    до чтения самого изображения.
+    """
+    default_error_messages = {
+        'invalid_base64': 'Ожидается изображение в формате '
+                          'data:image/<тип>;base64,<данные>.',
+        'too_large': 'Размер изображения не должен превышать '
+                     '{max_bytes} байт.',
+        'invalid_image': 'Загрузите корректное изображение.',
+        'invalid_format': 'Допустимые форматы изображения: {formats}.',
+        'too_many_pixels': 'Изображение не должно быть больше '
+                           '{max_side}x{max_side} и {max_pixels} пикселей.',
+    }
+
+    def __init__(self, *args, max_bytes=RECIPE_IMAGE_MAX_BYTES,
+                 max_side=RECIPE_IMAGE_MAX_SIDE,
+                 max_pixels=RECIPE_IMAGE_MAX_PIXELS, **kwargs):
+        self.max_bytes = max_bytes
+        self.max_side = max_side
+        self.max_pixels = max_pixels
+        super().__init__(*args, **kwargs)
 
-class Base64FileField(serializers.FileField):
-    """Custom field - декодирует base64 и сохраняет в файл"""
     def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith('data:image'):
-            format, filestr = data.split(';base64,')
-            extension = format.split('/')[-1]
-            id = uuid.uuid4()
-            data = ContentFile(base64.b64decode(filestr),
-                               name=f'{id.urn[9:]}.{extension}')
-        return super().to_internal_value(data)
+        if isinstance(data, str):
+            data = self.decode(data)
+        elif getattr(data, 'size', 0) > self.max_bytes:
+            self.fail('too_large', max_bytes=self.max_bytes)
+        file = super().to_internal_value(data)
+        self.check_image(file)
+        return file
+
+    def decode(self, data):
+        match = DATA_URI.match(data)
+        if match is None:
+            self.fail('invalid_base64')
+        start = match.end()
+        encoded_size = len(data) - start
+        padding = len(data) - len(data.rstrip('=')) if encoded_size else 0
+        size = encoded_size * 3 // 4 - padding
+        if encoded_size % 4 or size <= 0:
+            self.fail('invalid_base64')
+        if size > self.max_bytes:
+            self.fail('too_large', max_bytes=self.max_bytes)
+        file = File(NamedTemporaryFile(),
+                    name=f'{uuid.uuid4().hex}.{match.group("subtype")}')
+        try:
+            for position in range(start, len(data), CHUNK_SIZE):
+                file.write(b64decode(data[position:position + CHUNK_SIZE],
+                                     validate=True))
+        except (binascii.Error, ValueError):
+            file.close()
+            self.fail('invalid_base64')
+        file.flush()
+        file.seek(0)
+        return file
+
+    def check_image(self, file):
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+                if (max(width, height) > self.max_side
+                        or width * height > self.max_pixels):
+                    self.fail('too_many_pixels', max_side=self.max_side,
+                              max_pixels=self.max_pixels)
+                image_format = image.format
+                image.verify()
+        except Image.DecompressionBombError:
+            self.fail('too_many_pixels', max_side=self.max_side,
+                      max_pixels=self.max_pixels)
+        except (OSError, SyntaxError, ValueError):
+            self.fail('invalid_image')
+        if image_format not in IMAGE_FORMATS:
+            self.fail('invalid_format', formats=', '.join(IMAGE_FORMATS))
+        file.seek(0)
+        file.name = f'{uuid.uuid4().hex}.{IMAGE_FORMATS[image_format]}'
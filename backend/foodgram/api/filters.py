@@ -1,10 +1,23 @@
+from django.db.models import Exists, OuterRef
+from django.utils.functional import cached_property
 from django_filters import FilterSet, rest_framework
 
 from recipes import models
 
+from .relations import get_relations
+from .tag_registry import get_tag_ids
+
+# Промежуточные таблицы списков рецептов и их поле со ссылкой на список
+RECIPE_LISTS = {
+    'favorite': (models.Favorite.recipe.through, 'favorite_id'),
+    'shopping_cart': (models.ShoppingCart.recipe.through,
+                      'shoppingcart_id'),
+}
+
 
 class RecipeFilters(FilterSet):
-    tags = rest_framework.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = rest_framework.MultipleChoiceFilter(method='filter_tags')
+    search = rest_framework.CharFilter(method='filter_search')
     is_favorited = rest_framework.NumberFilter(
         method='filter_is_favorited'
     )
@@ -12,23 +25,56 @@ class RecipeFilters(FilterSet):
         method='filter_is_in_shopping_cart'
     )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Функция, а не метод: поля формы копируются через deepcopy
+        self.filters['tags'].extra['choices'] = lambda: [
+            (slug, slug) for slug in sorted(self.tag_ids)
+        ]
+
+    @cached_property
+    def tag_ids(self):
+        # Реестр читается один раз на запрос, хотя варианты выбора
+        # перебираются для каждого переданного тэга
+        return get_tag_ids()
+
+    def filter_tags(self, queryset, name, value):
+        # EXISTS вместо JOIN: рецепт с несколькими тэгами не дублируется
+        tag_ids = self.tag_ids
+        return queryset.filter(Exists(
+            models.Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk'),
+                tag_id__in=[tag_ids[slug] for slug in value
+                            if slug in tag_ids],
+            )
+        ))
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return queryset.search(value)
+
+    def filter_in_list(self, queryset, value, list_name):
+        """Рецепты, которые есть (1) или которых нет (0) в списке.
+
+        id списка берётся из связей запроса, поэтому подзапрос EXISTS
+        идёт прямо по индексу промежуточной таблицы без JOIN со списком.
+        """
+        if not self.request.user.is_authenticated or value not in (0, 1):
+            return queryset
+        through, list_field = RECIPE_LISTS[list_name]
+        list_id = get_relations(self.request).list_ids[list_name]
+        in_list = Exists(through.objects.filter(
+            **{list_field: list_id}, recipe_id=OuterRef('pk')
+        ))
+        return queryset.filter(in_list if value == 1 else ~in_list)
+
     def filter_is_favorited(self, queryset, name, value):
-        user = self.request.user
-        if user.is_authenticated:
-            if(value == 1):
-                return queryset.filter(favorites__user=user)
-            elif(value == 0):
-                return queryset.exclude(favorite__user=user)
-        return queryset
+        return self.filter_in_list(queryset, value, 'favorite')
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
-        user = self.request.user
-        if user.is_authenticated:
-            if(value == 1):
-                return queryset.filter(shoppingcarts__user=user)
-            elif(value == 0):
-                return queryset.exclude(shoppingcarts__user=user)
-        return queryset
+        return self.filter_in_list(queryset, value, 'shopping_cart')
 
     class Meta:
         model = models.Recipe
@@ -0,0 +1,113 @@
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Lock
+
+from recipes import models, versions
+
+
+def get_version():
+    """Версия справочника ингредиентов в базе и время её изменения."""
+    return versions.get_versions(versions.INGREDIENTS)[versions.INGREDIENTS]
+
+
+class IngredientIndex:
+    """Отсортированный индекс названий ингредиентов в памяти процесса.
+
+    Названия приводятся к одному регистру. Префиксный поиск - бинарный
+    поиск по названиям, поиск по вхождению - бинарный поиск по
+    отсортированным суффиксам названий; оба стоят O(log n + k).
+    Суффикс хранится парой (позиция названия, смещение), а не строкой:
+    память индекса растёт как число символов во всех названиях.
+    Индекс перестраивается, когда в базе меняется версия справочника
+    ингредиентов versions.INGREDIENTS - по ней же считается ETag списка.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._state = None
+
+    def build(self, version=None):
+        items = [
+            models.Ingredient(id=pk, name=name, measurement_unit=unit)
+            for pk, name, unit in models.Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        ]
+        items.sort(key=lambda item: (item.name.casefold(), item.id))
+        keys = [item.name.casefold() for item in items]
+        # Суффиксы с первой позиции: вхождения с начала названия
+        # находит префиксный поиск. Сортируем по первому символу,
+        # поэтому строки суффиксов существуют только для одной группы
+        buckets = defaultdict(list)
+        for position, key in enumerate(keys):
+            for start in range(1, len(key)):
+                buckets[key[start]].append((position, start))
+        positions, offsets = array('L'), array('L')
+        for char in sorted(buckets):
+            bucket = buckets.pop(char)
+            bucket.sort(key=lambda pair: keys[pair[0]][pair[1]:])
+            for position, start in bucket:
+                positions.append(position)
+                offsets.append(start)
+        self._state = (version, keys, items, positions, offsets)
+        return self._state
+
+    def get_state(self, version=None):
+        if version is None:
+            version = get_version()
+        state = self._state
+        if state is None or state[0] != version:
+            with self._lock:
+                state = self._state
+                if state is None or state[0] != version:
+                    state = self.build(version)
+        return state
+
+    @staticmethod
+    def first_suffix(keys, positions, offsets, query):
+        """Номер первого суффикса не меньше query (как bisect_left)."""
+        low, high = 0, len(positions)
+        while low < high:
+            middle = (low + high) // 2
+            start = offsets[middle]
+            if keys[positions[middle]][start:start + len(query)] < query:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def search(self, query, limit=None, version=None):
+        """Ищет сначала по началу названия, затем по вхождению.
+
+        Внутри каждой группы результаты упорядочены по названию.
+        version - уже прочитанная версия справочника (см. get_version).
+        """
+        _, keys, items, positions, offsets = self.get_state(version)
+        query = query.casefold()
+        if not query:
+            return items[:limit]
+        result = []
+        position = bisect_left(keys, query)
+        while (position < len(keys) and keys[position].startswith(query)
+               and (limit is None or len(result) < limit)):
+            result.append(items[position])
+            position += 1
+        if limit is not None and len(result) >= limit:
+            return result
+        found = set()
+        index = self.first_suffix(keys, positions, offsets, query)
+        while (index < len(positions)
+               and keys[positions[index]].startswith(query, offsets[index])):
+            found.add(positions[index])
+            index += 1
+        for position in sorted(found):
+            if keys[position].startswith(query):
+                continue
+            result.append(items[position])
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from recipes.counters import change_counters
+
+ADDED = 'added'
+ALREADY_ADDED = 'already_added'
+REMOVED = 'removed'
+NOT_IN_LIST = 'not_in_list'
+NOT_FOUND = 'not_found'
+
+
+class PersonalListEditor:
+    """Пакетное изменение личного списка через промежуточную таблицу M2M.
+
+    Существование id и их наличие в списке проверяются одним запросом,
+    добавление - одна вставка с игнорированием конфликтов, удаление -
+    один DELETE. Денормализованный счётчик правится той же пачкой.
+    Строка списка блокируется на время изменения, поэтому параллельные
+    запросы к одному списку (двойной клик) видят результат друг друга,
+    а статусы и счётчики соответствуют строкам, которые изменил запрос.
+    """
+
+    def __init__(self, personal_list, field_name, counter_field):
+        field = personal_list._meta.get_field(field_name)
+        self.through = field.remote_field.through
+        self.source = field.m2m_field_name()
+        self.target = field.m2m_reverse_field_name()
+        self.target_model = field.related_model
+        self.list_model = type(personal_list)
+        self.list_id = personal_list.pk
+        self.counter_field = counter_field
+
+    def rows(self, **filters):
+        return self.through.objects.filter(
+            **{self.source: self.list_id}, **filters
+        )
+
+    def lock(self):
+        """Блокирует строку списка до конца транзакции."""
+        list(self.list_model.objects.select_for_update().
+             filter(pk=self.list_id).values_list('pk', flat=True))
+
+    def lookup(self, ids):
+        """Возвращает {id: есть ли в списке} для существующих объектов."""
+        listed = self.rows(**{self.target: OuterRef('pk')})
+        return dict(
+            self.target_model.objects.filter(pk__in=ids).order_by().
+            annotate(listed=Exists(listed)).values_list('pk', 'listed')
+        )
+
+    @transaction.atomic(savepoint=False)
+    def add(self, ids):
+        self.lock()
+        found = self.lookup(ids)
+        new_ids = [pk for pk, listed in found.items() if not listed]
+        self.through.objects.bulk_create(
+            (self.through(**{f'{self.source}_id': self.list_id,
+                             f'{self.target}_id': pk})
+             for pk in new_ids),
+            ignore_conflicts=True
+        )
+        change_counters(self.target_model, self.counter_field, new_ids)
+        return self.report(ids, found, ALREADY_ADDED, ADDED)
+
+    @transaction.atomic(savepoint=False)
+    def remove(self, ids):
+        self.lock()
+        found = self.lookup(ids)
+        listed_ids = [pk for pk, listed in found.items() if listed]
+        if listed_ids:
+            self.rows(**{f'{self.target}__in': listed_ids}).delete()
+            change_counters(self.target_model, self.counter_field,
+                            listed_ids, sign=-1)
+        return self.report(ids, found, REMOVED, NOT_IN_LIST)
+
+    @staticmethod
+    def report(ids, found, if_listed, if_not_listed):
+        return [
+            {
+                'id': pk,
+                'status': (NOT_FOUND if pk not in found
+                           else if_listed if found[pk] else if_not_listed),
+            }
+            for pk in dict.fromkeys(ids)
+        ]
+
+
+def favorites(user):
+    return PersonalListEditor(user.favorite, 'recipe', 'favorites_count')
+
+
+def shopping_cart(user):
+    return PersonalListEditor(user.shoppingcart, 'recipe',
+                              'shopping_carts_count')
+
+
+def subscriptions(user):
+    return PersonalListEditor(user.subscription, 'following',
+                              'followers_count')
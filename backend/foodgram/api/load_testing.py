@@ -0,0 +1,275 @@
+"""Нагрузочный прогон API: сценарии, исполнители и сводка задержек.
+
+Запросы идут либо прямо в WSGI-приложение foodgram.wsgi внутри процесса,
+либо по HTTP на запущенный сервер. Каждый поток выбирает сценарии
+случайно с заданными весами; задержки собираются по шаблону адреса,
+чтобы /api/recipes/1/ и /api/recipes/2/ попали в одну строку отчёта.
+"""
+import http.client
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from io import BytesIO
+from random import Random
+from statistics import mean, quantiles
+from time import monotonic, perf_counter
+from urllib.parse import urlencode, urlsplit
+from wsgiref.util import setup_testing_defaults
+
+from django.db import connections
+
+from foodgram.wsgi import application
+
+DEFAULT_WEIGHTS = {
+    'browse': 50,
+    'filter_tags': 20,
+    'autocomplete': 15,
+    'toggle_favorite': 10,
+    'download_cart': 5,
+}
+PAGE_SIZE = 6
+# Просматривают в основном первые страницы
+MAX_BROWSE_PAGE = 50
+
+
+@dataclass(frozen=True)
+class Context:
+    """Данные из базы, из которых сценарии собирают запросы."""
+    recipe_ids: tuple
+    recipe_pages: int
+    tag_slugs: tuple
+    ingredient_names: tuple
+    tokens: tuple
+    anonymous_share: float
+
+
+class Request:
+    __slots__ = ('method', 'path', 'query', 'token', 'endpoint')
+
+    def __init__(self, method, path, endpoint, query=None, token=None):
+        self.method = method
+        self.path = path
+        self.endpoint = f'{method} {endpoint}'
+        self.query = urlencode(query or {}, doseq=True)
+        self.token = token
+
+
+def reader_token(context, rng):
+    if not context.tokens or rng.random() < context.anonymous_share:
+        return None
+    return rng.choice(context.tokens)
+
+
+def browse(context, rng):
+    """Страница списка рецептов и один рецепт с неё."""
+    token = reader_token(context, rng)
+    page = min(int(rng.paretovariate(1.5)), context.recipe_pages)
+    yield Request('GET', '/api/recipes/', '/api/recipes/',
+                  {'page': page, 'limit': PAGE_SIZE}, token)
+    recipe_id = rng.choice(context.recipe_ids)
+    yield Request('GET', f'/api/recipes/{recipe_id}/', '/api/recipes/{id}/',
+                  token=token)
+
+
+def filter_tags(context, rng):
+    token = reader_token(context, rng)
+    query = {'tags': rng.sample(context.tag_slugs,
+                                min(len(context.tag_slugs),
+                                    rng.randint(1, 2))),
+             'limit': PAGE_SIZE}
+    if token is not None and rng.random() < 0.3:
+        query['is_favorited'] = 1
+    yield Request('GET', '/api/recipes/', '/api/recipes/?tags', query, token)
+
+
+def autocomplete(context, rng):
+    """Ввод названия ингредиента: запрос на каждую букву префикса."""
+    token = reader_token(context, rng)
+    name = rng.choice(context.ingredient_names)
+    for length in range(1, min(len(name), rng.randint(2, 5)) + 1):
+        yield Request('GET', '/api/ingredients/', '/api/ingredients/?name',
+                      {'name': name[:length]}, token)
+
+
+def toggle_favorite(context, rng):
+    token = rng.choice(context.tokens)
+    path = f'/api/recipes/{rng.choice(context.recipe_ids)}/favorite/'
+    for method in ('POST', 'DELETE'):
+        yield Request(method, path, '/api/recipes/{id}/favorite/',
+                      token=token)
+
+
+def download_cart(context, rng):
+    yield Request('GET', '/api/recipes/download_shopping_cart/',
+                  '/api/recipes/download_shopping_cart/',
+                  token=rng.choice(context.tokens))
+
+
+SCENARIOS = {
+    'browse': browse,
+    'filter_tags': filter_tags,
+    'autocomplete': autocomplete,
+    'toggle_favorite': toggle_favorite,
+    'download_cart': download_cart,
+}
+# Сценарии, которым нужен авторизованный пользователь
+AUTHENTICATED_SCENARIOS = ('toggle_favorite', 'download_cart')
+
+
+class WSGITransport:
+    """Вызывает WSGI-приложение напрямую, без сети."""
+
+    def __init__(self, host):
+        self.host = host
+
+    def send(self, request):
+        environ = {
+            'REQUEST_METHOD': request.method,
+            'PATH_INFO': request.path,
+            'QUERY_STRING': request.query,
+            'HTTP_HOST': self.host,
+            'wsgi.input': BytesIO(),
+        }
+        if request.token:
+            environ['HTTP_AUTHORIZATION'] = f'Token {request.token}'
+        setup_testing_defaults(environ)
+        statuses = []
+
+        def start_response(status, headers, exc_info=None):
+            statuses.append(status)
+
+        response = application(environ, start_response)
+        try:
+            for _ in response:
+                pass
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        return int(statuses[0].split()[0])
+
+    def close(self):
+        connections.close_all()
+
+
+class HTTPTransport:
+    """Шлёт запросы на сервер по одному keep-alive соединению."""
+
+    def __init__(self, url, timeout=30):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.connection = None
+
+    def send(self, request):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+        url = request.path
+        if request.query:
+            url = f'{url}?{request.query}'
+        headers = {}
+        if request.token:
+            headers['Authorization'] = f'Token {request.token}'
+        try:
+            self.connection.request(request.method, url, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+        return response.status
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+@dataclass(frozen=True)
+class Config:
+    context: Context
+    weights: dict
+    duration: float
+    threads: int
+    seed: int
+    url: str = None
+    host: str = 'localhost'
+
+    def transport(self):
+        if self.url:
+            return HTTPTransport(self.url)
+        return WSGITransport(self.host)
+
+
+def run_thread(config, rng, deadline, samples):
+    """Выполняет сценарии до deadline, пишет (эндпоинт, статус, время)."""
+    names = list(config.weights)
+    weights = [config.weights[name] for name in names]
+    transport = config.transport()
+    try:
+        while monotonic() < deadline:
+            [name] = rng.choices(names, weights)
+            for request in SCENARIOS[name](config.context, rng):
+                started = perf_counter()
+                try:
+                    status = transport.send(request)
+                except (OSError, http.client.HTTPException):
+                    status = 0
+                samples.append((request.endpoint, status,
+                                perf_counter() - started))
+    finally:
+        transport.close()
+
+
+def run_process(config, process=0):
+    """Запускает config.threads потоков, возвращает их замеры."""
+    deadline = monotonic() + config.duration
+    samples = []
+    threads = [
+        threading.Thread(
+            target=run_thread,
+            args=(config, Random(f'{config.seed}:{process}:{index}'),
+                  deadline, samples),
+        )
+        for index in range(config.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def percentile_ms(percentiles, number):
+    return round(percentiles[number - 1] * 1000, 2)
+
+
+def summarize(samples, elapsed):
+    """Пропускная способность и перцентили задержки по эндпоинтам."""
+    grouped = defaultdict(list)
+    for endpoint, status, duration in samples:
+        grouped[endpoint].append((status, duration))
+    grouped['TOTAL'] = [(status, duration)
+                        for _, status, duration in samples]
+    report = {}
+    for endpoint, rows in sorted(grouped.items()):
+        durations = [duration for _, duration in rows]
+        statuses = defaultdict(int)
+        for status, _ in rows:
+            statuses[str(status)] += 1
+        percentiles = (quantiles(durations, n=100, method='inclusive')
+                       if len(durations) > 1 else durations * 99)
+        report[endpoint] = {
+            'requests': len(rows),
+            'errors': sum(1 for status, _ in rows
+                          if not 200 <= status < 400),
+            'statuses': dict(sorted(statuses.items())),
+            'throughput_rps': round(len(rows) / elapsed, 2),
+            'mean_ms': round(mean(durations) * 1000, 2),
+            'p50_ms': percentile_ms(percentiles, 50),
+            'p95_ms': percentile_ms(percentiles, 95),
+            'p99_ms': percentile_ms(percentiles, 99),
+            'max_ms': round(max(durations) * 1000, 2),
+        }
+    return report
@@ -0,0 +1,87 @@
+import random
+from statistics import mean, quantiles
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ingredient_index import IngredientIndex
+from recipes import models
+
+
+def orm_search(query, limit=None):
+    """Тот же поиск, что у индекса, двумя запросами к базе."""
+    ingredients = models.Ingredient.objects.order_by('name', 'id')
+    result = list(ingredients.filter(name__istartswith=query)[:limit])
+    if limit is not None and len(result) >= limit:
+        return result
+    rest = None if limit is None else limit - len(result)
+    return result + list(ingredients.filter(name__icontains=query).exclude(
+        name__istartswith=query
+    )[:rest])
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск ингредиентов через ORM и через индекс '
+            'в памяти процесса: в обоих случаях сначала совпадения '
+            'с начала названия, затем вхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=500,
+                            help='Количество поисковых запросов')
+        parser.add_argument('--prefix-length', type=int, default=2,
+                            help='Длина префикса, как при вводе в форму')
+        parser.add_argument('--infix', action='store_true',
+                            help='Брать строки из середины названий, '
+                                 'а не с начала')
+        parser.add_argument('--limit', type=int,
+                            help='Наибольшее число результатов')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        names = list(models.Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            raise CommandError('Таблица ингредиентов пуста')
+        rng = random.Random(options['seed'])
+        length = options['prefix_length']
+        limit = options['limit']
+        prefixes = []
+        for _ in range(options['queries']):
+            name = rng.choice(names)
+            start = (rng.randrange(max(1, len(name) - length + 1))
+                     if options['infix'] else 0)
+            prefixes.append(name[start:start + length])
+
+        index = IngredientIndex()
+        started = perf_counter()
+        index.get_state()
+        build_time = perf_counter() - started
+
+        orm = self.measure(lambda prefix: orm_search(prefix, limit),
+                           prefixes)
+        in_memory = self.measure(lambda prefix: index.search(prefix, limit),
+                                 prefixes)
+        self.stdout.write(f'Ингредиентов: {len(names)}, '
+                          f'запросов: {len(prefixes)}')
+        self.stdout.write(f'Построение индекса: {build_time * 1000:.1f} мс')
+        self.report('ORM', orm)
+        self.report('Индекс', in_memory)
+        self.stdout.write(
+            f'Ускорение по среднему: {mean(orm) / mean(in_memory):.1f}x'
+        )
+
+    @staticmethod
+    def measure(search, prefixes):
+        timings = []
+        for prefix in prefixes:
+            started = perf_counter()
+            search(prefix)
+            timings.append(perf_counter() - started)
+        return timings
+
+    def report(self, title, timings):
+        percentiles = quantiles(timings, n=100)
+        p50, p95 = percentiles[49], percentiles[94]
+        self.stdout.write(
+            f'{title}: среднее {mean(timings) * 1e6:.0f} мкс, '
+            f'p50 {p50 * 1e6:.0f} мкс, p95 {p95 * 1e6:.0f} мкс'
+        )
@@ -0,0 +1,177 @@
+import json
+import multiprocessing
+from pathlib import Path
+from random import Random
+from time import monotonic
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from rest_framework.authtoken.models import Token
+
+from api import load_testing
+from recipes import models
+
+# Сколько id рецептов и названий ингредиентов берут сценарии
+RECIPE_SAMPLE = 10_000
+INGREDIENT_SAMPLE = 2_000
+
+
+def parse_weight(value):
+    name, _, weight = value.partition('=')
+    if name not in load_testing.SCENARIOS or not weight.isdigit():
+        raise ValueError(value)
+    return name, int(weight)
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон API с взвешенными сценариями в нескольких '
+            'потоках и процессах: пропускная способность и перцентили '
+            'задержки по эндпоинтам')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url',
+                            help='Адрес запущенного сервера, например '
+                                 'http://127.0.0.1:8000; без него запросы '
+                                 'идут в foodgram.wsgi внутри процесса')
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Длительность прогона в секундах')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Потоков в каждом процессе')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Количество процессов')
+        parser.add_argument('--scenario', action='append', default=[],
+                            type=parse_weight, metavar='ИМЯ=ВЕС',
+                            help='Вес сценария, можно повторять; сценарии: '
+                                 + ', '.join(load_testing.SCENARIOS))
+        parser.add_argument('--users', type=int, default=50,
+                            help='Сколько пользователей получат токены')
+        parser.add_argument('--anonymous-share', type=float, default=0.5,
+                            help='Доля анонимных запросов на чтение')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно выбора сценариев и данных')
+        parser.add_argument('--output', type=Path,
+                            help='Файл для отчёта в JSON')
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['processes'] < 1:
+            raise CommandError('Нужен хотя бы 1 поток и 1 процесс')
+        weights = dict(load_testing.DEFAULT_WEIGHTS)
+        if options['scenario']:
+            weights = dict(options['scenario'])
+        context = self.get_context(options)
+        skipped = set()
+        if not context.tokens:
+            skipped.update(load_testing.AUTHENTICATED_SCENARIOS)
+        if not context.tag_slugs:
+            skipped.add('filter_tags')
+        if not context.ingredient_names:
+            skipped.add('autocomplete')
+        for name in sorted(skipped & set(weights)):
+            self.stderr.write(f'Сценарий {name} пропущен: нет данных')
+            del weights[name]
+        weights = {name: weight for name, weight in weights.items()
+                   if weight > 0}
+        if not weights:
+            raise CommandError('Нет сценариев с положительным весом')
+        config = load_testing.Config(
+            context=context,
+            weights=weights,
+            duration=options['duration'],
+            threads=options['threads'],
+            seed=options['seed'],
+            url=options['url'],
+            host=self.get_host(),
+        )
+        self.stdout.write(
+            f'{options["processes"]} x {options["threads"]} потоков, '
+            f'{options["duration"]:.0f} с, '
+            f'{options["url"] or "внутри процесса"}'
+        )
+        started = monotonic()
+        samples = self.run(config, options['processes'])
+        elapsed = monotonic() - started
+        report = {
+            'meta': {
+                'target': options['url'] or 'wsgi',
+                'processes': options['processes'],
+                'threads': options['threads'],
+                'duration_s': round(elapsed, 2),
+                'seed': options['seed'],
+                'weights': weights,
+                'anonymous_share': options['anonymous_share'],
+            },
+            'endpoints': load_testing.summarize(samples, elapsed),
+        }
+        self.print_report(report['endpoints'])
+        if options['output']:
+            options['output'].write_text(
+                json.dumps(report, ensure_ascii=False, indent=2) + '\n',
+                encoding='utf-8'
+            )
+            self.stdout.write(f'Отчёт записан в {options["output"]}')
+
+    def get_host(self):
+        hosts = [host for host in settings.ALLOWED_HOSTS
+                 if host != '*' and not host.startswith('.')]
+        return hosts[0] if hosts else 'localhost'
+
+    def get_context(self, options):
+        rng = Random(options['seed'])
+        recipe_ids = list(models.Recipe.objects.values_list('pk', flat=True))
+        if not recipe_ids:
+            raise CommandError('В базе нет рецептов, см. generate_dataset')
+        names = list(models.Ingredient.objects.values_list('name',
+                                                           flat=True))
+        user_ids = list(models.User.objects.filter(is_active=True).
+                        order_by('pk').values_list('pk', flat=True)
+                        [:options['users']])
+        return load_testing.Context(
+            recipe_ids=tuple(rng.sample(recipe_ids,
+                                        min(len(recipe_ids), RECIPE_SAMPLE))),
+            recipe_pages=max(1, min(load_testing.MAX_BROWSE_PAGE,
+                                    len(recipe_ids)
+                                    // load_testing.PAGE_SIZE)),
+            tag_slugs=tuple(models.Tag.objects.values_list('slug',
+                                                           flat=True)),
+            ingredient_names=tuple(rng.sample(
+                names, min(len(names), INGREDIENT_SAMPLE)
+            )),
+            tokens=self.get_tokens(user_ids),
+            anonymous_share=options['anonymous_share'],
+        )
+
+    def get_tokens(self, user_ids):
+        """Токены пользователей; недостающие создаются."""
+        tokens = dict(Token.objects.filter(user_id__in=user_ids).
+                      values_list('user_id', 'key'))
+        missing = [Token(user_id=pk, key=Token.generate_key())
+                   for pk in user_ids if pk not in tokens]
+        Token.objects.bulk_create(missing)
+        tokens.update((token.user_id, token.key) for token in missing)
+        return tuple(tokens[pk] for pk in user_ids)
+
+    def run(self, config, processes):
+        if processes == 1:
+            return load_testing.run_process(config)
+        # Процессы открывают свои соединения с базой
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            results = pool.starmap(
+                load_testing.run_process,
+                [(config, process) for process in range(processes)]
+            )
+        return [sample for samples in results for sample in samples]
+
+    def print_report(self, endpoints):
+        self.stdout.write(
+            f'{"эндпоинт":45} {"запросов":>8} {"rps":>8} {"p50":>8} '
+            f'{"p95":>8} {"p99":>8} {"ошибок":>7}'
+        )
+        for endpoint, stats in endpoints.items():
+            self.stdout.write(
+                f'{endpoint:45} {stats["requests"]:8d} '
+                f'{stats["throughput_rps"]:8.1f} {stats["p50_ms"]:8.1f} '
+                f'{stats["p95_ms"]:8.1f} {stats["p99_ms"]:8.1f} '
+                f'{stats["errors"]:7d}'
+            )
@@ -1,48 +1,137 @@
+import logging
+from functools import lru_cache
+from hashlib import sha256
+from io import BytesIO
 from os.path import join
-from pathlib import Path
 
-from django.db.models import Sum
-from django.http import FileResponse
+from django.db.models import Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from reportlab.lib.pagesizes import A4
 from reportlab.pdfbase import pdfmetrics, ttfonts
 from reportlab.pdfgen import canvas
 
-from foodgram.settings import BASE_DIR, MEDIA_ROOT
-from recipes import models
-
-
-def create_and_download_cart(request):
-    recipes = request.user.shoppingcart.recipe.all()
-    amount_of_ingredients = (models.AmountOfIngredient.objects.
-                             filter(recipe__in=recipes))
-    recipe_ingredients = (amount_of_ingredients.values('ingredient').
-                          annotate(ingredient_amount=Sum('amount')))
-    dir_path = join(MEDIA_ROOT, 'shopping_carts', request.user.username)
-    Path(dir_path).mkdir(parents=True, exist_ok=True)
-    filename = 'shopping_cart.pdf'
-    file_path = join(dir_path, filename)
-    shopping_cart = canvas.Canvas(file_path)
+from foodgram.settings import BASE_DIR, SHOPPING_CART_CACHE_SIZE
+from recipes import models, versions
+
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+FONT_NAME = 'FreeSans'
+FONT_SIZE = 12
+LEADING = 16
+MARGIN = 40
+FILENAME = 'shopping_cart'
+CHUNK_SIZE = 500
+# Увеличивать при любом изменении вёрстки документа
+TEMPLATE_VERSION = 1
+
+cart_documents = LRUCache(SHOPPING_CART_CACHE_SIZE)
+
+
+@lru_cache(maxsize=None)
+def register_fonts():
+    """Регистрирует шрифт один раз на процесс."""
     font_path = join(BASE_DIR, 'fonts', 'FreeSans.ttf')
-    pdfmetrics.registerFont(ttfonts.TTFont('FreeSans', font_path))
-    shopping_cart.setFont('FreeSans', 12)
-    text = shopping_cart.beginText(40, 780)
-    text.textLine('Foodgram')
-    text.textLine('_______________')
-    text.textLine('Список покупок:')
-    for recipe_ingredient in recipe_ingredients:
-        ingredient = (models.Ingredient.objects.
-                      get(id=recipe_ingredient['ingredient']))
-        ingredient_line = (
-            '   - ' +
-            ingredient.name +
-            ' - ' +
-            str(recipe_ingredient.get('ingredient_amount')) +
-            ' ' +
-            ingredient.measurement_unit
-        )
-        text.textLine(ingredient_line)
-    shopping_cart.drawText(text)
+    pdfmetrics.registerFont(ttfonts.TTFont(FONT_NAME, font_path))
+
+
+def get_cart_ingredients(user):
+    """Суммирует ингредиенты из списка покупок одним запросом."""
+    return (models.AmountOfIngredient.objects.
+            filter(recipe__shoppingcarts__user=user).
+            values_list('ingredient__name', 'ingredient__measurement_unit').
+            annotate(ingredient_amount=Sum('amount')).
+            order_by('ingredient__name', 'ingredient__measurement_unit'))
+
+
+def render_cart_pdf(ingredients):
+    """Рисует список покупок в PDF, перенося строки на новые страницы."""
+    register_fonts()
+    buffer = BytesIO()
+    shopping_cart = canvas.Canvas(buffer, pagesize=A4)
+    _, height = A4
+    lines = ['Foodgram', '_______________', 'Список покупок:']
+    lines.extend(
+        f'   - {name} - {amount} {measurement_unit}'
+        for name, measurement_unit, amount in ingredients
+    )
+    text = None
+    for line in lines:
+        if text is None:
+            shopping_cart.setFont(FONT_NAME, FONT_SIZE)
+            text = shopping_cart.beginText(MARGIN, height - MARGIN)
+            text.setFont(FONT_NAME, FONT_SIZE, leading=LEADING)
+        text.textLine(line)
+        if text.getY() < MARGIN:
+            shopping_cart.drawText(text)
+            shopping_cart.showPage()
+            text = None
+    if text is not None:
+        shopping_cart.drawText(text)
     shopping_cart.save()
-    return FileResponse(open(file_path, 'rb'),
-                        as_attachment=True,
-                        filename=filename
-                        )
+    return buffer.getvalue()
+
+
+def get_cart_key(user):
+    """Ключ документа - хэш версии шаблона и состояния списка покупок.
+
+    Состояние - id рецептов списка, время их изменения и версия
+    справочника ингредиентов; всё читается одним запросом без агрегации.
+    """
+    ingredients_version = models.ContentVersion.objects.filter(
+        scope=versions.INGREDIENTS
+    ).values('version')[:1]
+    recipes = models.Recipe.objects.filter(
+        shoppingcarts__user=user
+    ).annotate(
+        ingredients_version=Coalesce(Subquery(ingredients_version), 0)
+    ).order_by('pk').values_list('pk', 'modified', 'ingredients_version')
+    digest = sha256(f'pdf:{TEMPLATE_VERSION}'.encode())
+    for pk, modified, ingredients_version in recipes:
+        digest.update(
+            f'\n{pk}\t{modified.isoformat()}\t{ingredients_version}'.encode()
+        )
+    return digest.hexdigest()
+
+
+def get_cart_pdf(user, ingredients):
+    """Возвращает PDF из кэша или рисует и кэширует его.
+
+    ingredients - ленивый итератор: при попадании в кэш запрос
+    с агрегацией ингредиентов не выполняется.
+    """
+    key = get_cart_key(user)
+    document = cart_documents.get(key)
+    hit = document is not None
+    if not hit:
+        document = render_cart_pdf(ingredients)
+        cart_documents.set(key, document)
+    stats = cart_documents.stats()
+    logger.info(
+        'Кэш списков покупок: %s; попаданий %s, промахов %s, '
+        'документов %s из %s', 'HIT' if hit else 'MISS', stats['hits'],
+        stats['misses'], stats['size'], stats['maxsize']
+    )
+    return document
+
+
+def create_and_download_cart(request, renderer):
+    """Отдаёт список покупок в формате, выбранном рендерером.
+
+    Строки читаются курсором и сразу уходят клиенту, поэтому текстовые
+    форматы не держат весь список в памяти.
+    """
+    ingredients = (get_cart_ingredients(request.user).
+                   iterator(chunk_size=CHUNK_SIZE))
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type = f'{content_type}; charset={renderer.charset}'
+    response = StreamingHttpResponse(renderer.stream(ingredients,
+                                                     request.user),
+                                     content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="{FILENAME}.{renderer.format}"'
+    )
+    return response
@@ -1,6 +1,240 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from hashlib import md5
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from foodgram.settings import APPROXIMATE_COUNT_THRESHOLD, COUNT_CACHE_TTL
+from recipes import models, versions
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+
+
+# Версии данных в базе, которые меняются при создании и удалении строк
+COUNT_SCOPES = {
+    models.Recipe: versions.RECIPES,
+    models.User: versions.USERS,
+}
+
+
+def estimate_count(queryset):
+    """Оценка числа строк планировщиком PostgreSQL, без выполнения."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def approximate_count(queryset, threshold=APPROXIMATE_COUNT_THRESHOLD):
+    """Возвращает число строк и признак того, что оно точное.
+
+    Точное число неотфильтрованного списка кэшируется под версией его
+    данных в базе (COUNT_SCOPES). Если планировщик оценивает выдачу
+    не меньше чем в threshold строк, COUNT(*) не выполняется и отдаётся
+    оценка.
+    """
+    key = None
+    scope = COUNT_SCOPES.get(queryset.model)
+    if scope is not None and not queryset.query.where:
+        version, modified = versions.get_versions(scope)[scope]
+        sql, params = queryset.order_by().query.sql_with_params()
+        digest = md5(f'{version}:{modified}:{sql}{params}'.encode())
+        key = (f'count:{queryset.model._meta.label_lower}:'
+               f'{digest.hexdigest()}')
+        count = cache.get(key)
+        if count is not None:
+            return count, True
+    estimate = estimate_count(queryset)
+    if estimate is not None and estimate >= threshold:
+        return estimate, False
+    count = queryset.count()
+    if key is not None:
+        cache.set(key, count, COUNT_CACHE_TTL)
+    return count, True
+
+
+class ApproximateCountPaginator(Paginator):
+    count_is_exact = True
+
+    @cached_property
+    def count(self):
+        count, self.count_is_exact = approximate_count(self.object_list)
+        return count
+
+    def validate_number(self, number):
+        # Оценка бывает меньше настоящего числа строк, поэтому
+        # страницы за её пределами не считаются ошибкой
+        if self.count and not self.count_is_exact:
+            try:
+                number = int(number)
+            except (TypeError, ValueError):
+                raise PageNotAnInteger('Номер страницы должен быть числом')
+            if number < 1:
+                raise EmptyPage('Номер страницы меньше 1')
+            return number
+        return super().validate_number(number)
+
+
+class ApproximateCountPagination(CustomPageNumberPagination):
+    """Нумерация страниц без точного COUNT(*) для больших выдач."""
+    django_paginator_class = ApproximateCountPaginator
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['count_is_exact'] = self.page.paginator.count_is_exact
+        return response
+
+
+class KeysetPagination(BasePagination):
+    """Постраничный вывод по ключу сортировки вместо OFFSET.
+
+    Курсор хранит значения полей ordering у крайней строки страницы,
+    следующая страница выбирается условием «после этих значений»
+    по составному индексу, поэтому её цена не зависит от глубины.
+    Последнее поле ordering должно быть уникальным. Выдачу со своей
+    сортировкой (например, поиск по релевантности) курсор не
+    пересортировывает, а отклоняет с ошибкой 400.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 6
+    ordering = ('id',)
+    invalid_cursor_message = 'Некорректный курсор'
+    ordered_queryset_message = ('Курсор нельзя сочетать с другой '
+                                'сортировкой выдачи, например с поиском')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        if (queryset.query.order_by
+                and tuple(queryset.query.order_by) != tuple(self.ordering)):
+            raise ValidationError(
+                {self.cursor_query_param: self.ordered_queryset_message}
+            )
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self.invert(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+        page = list(queryset[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = page
+        return page
+
+    def get_page_size(self, request):
+        limit = request.query_params.get(self.page_size_query_param)
+        if limit is not None and limit.isdigit() and int(limit) > 0:
+            return int(limit)
+        return self.page_size
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def after(ordering, position):
+        """Условие «строго после position» для сортировки ordering."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode()))
+            values, reverse = data['p'], bool(data['r'])
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, obj, reverse):
+        values = [getattr(obj, field.lstrip('-')) for field in self.ordering]
+        data = json.dumps({'p': values, 'r': int(reverse)},
+                          default=str, separators=(',', ':'))
+        return replace_query_param(
+            self.base_url, self.cursor_query_param,
+            urlsafe_b64encode(data.encode()).decode()
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class RecipeKeysetPagination(KeysetPagination):
+    ordering = ('-pub_date', '-id')
+
+
+class SelectablePaginationMixin:
+    """Включает постраничный вывод по курсору параметром ?cursor=.
+
+    Без параметра остаётся нумерация страниц, на которую рассчитан фронтенд.
+    """
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            pagination_class = self.pagination_class
+            if (self.keyset_pagination_class is not None
+                    and KeysetPagination.cursor_query_param
+                    in self.request.query_params):
+                pagination_class = self.keyset_pagination_class
+            self._paginator = (None if pagination_class is None
+                               else pagination_class())
+        return self._paginator
@@ -0,0 +1,77 @@
+from django.utils.functional import cached_property
+
+from recipes import models
+
+
+class Relations:
+    """Связи текущего пользователя в рамках одного запроса.
+
+    Каждое множество id загружается одним запросом при первом обращении,
+    дальше сериализаторы проверяют принадлежность в памяти.
+    """
+    cached = ('following_ids', 'favorite_ids', 'shopping_cart_ids')
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def following_ids(self):
+        if not self.user.is_authenticated:
+            return frozenset()
+        return frozenset(
+            models.Subscription.following.through.objects.filter(
+                subscription__user_id=self.user.id
+            ).values_list('user_id', flat=True)
+        )
+
+    @cached_property
+    def favorite_ids(self):
+        if not self.user.is_authenticated:
+            return frozenset()
+        return frozenset(
+            models.Favorite.recipe.through.objects.filter(
+                favorite__user_id=self.user.id
+            ).values_list('recipe_id', flat=True)
+        )
+
+    @cached_property
+    def shopping_cart_ids(self):
+        if not self.user.is_authenticated:
+            return frozenset()
+        return frozenset(
+            models.ShoppingCart.recipe.through.objects.filter(
+                shoppingcart__user_id=self.user.id
+            ).values_list('recipe_id', flat=True)
+        )
+
+    @cached_property
+    def list_ids(self):
+        """id избранного, списка покупок и подписок пользователя.
+
+        Списки создаются вместе с пользователем и не меняются, поэтому
+        все три id читаются одним запросом и не сбрасываются invalidate.
+        """
+        if not self.user.is_authenticated:
+            return dict.fromkeys(('favorite', 'shopping_cart',
+                                  'subscription'))
+        favorite, shopping_cart, subscription = (
+            models.User.objects.filter(pk=self.user.id).values_list(
+                'favorites', 'shoppingcarts', 'subscriptions'
+            ).get()
+        )
+        return {'favorite': favorite, 'shopping_cart': shopping_cart,
+                'subscription': subscription}
+
+    def invalidate(self):
+        for name in self.cached:
+            self.__dict__.pop(name, None)
+
+
+def get_relations(request):
+    """Возвращает связи пользователя, закреплённые за запросом."""
+    http_request = getattr(request, '_request', request)
+    relations = getattr(http_request, 'relations', None)
+    if relations is None or relations.user != request.user:
+        relations = Relations(request.user)
+        http_request.relations = relations
+    return relations
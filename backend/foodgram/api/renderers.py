@@ -0,0 +1,86 @@
+import csv
+import json
+from abc import ABCMeta, abstractmethod
+
+from rest_framework import renderers
+
+from .methods import get_cart_pdf, render_cart_pdf
+
+
+class EchoBuffer:
+    """Файлоподобный объект, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingCartRenderer(renderers.BaseRenderer, metaclass=ABCMeta):
+    """Базовый рендерер выгрузки списка покупок.
+
+    Рендереры участвуют в согласовании формата (?format= и Accept),
+    а сам документ отдаёт метод stream - по частям, по мере чтения строк.
+    render собирает те же части целиком для обычного Response.
+    """
+    charset = 'utf-8'
+
+    @abstractmethod
+    def stream(self, ingredients, user):
+        """Отдаёт документ по частям: bytes или str."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        request = (renderer_context or {}).get('request')
+        chunks = self.stream(data, getattr(request, 'user', None))
+        if self.render_style == 'binary':
+            return b''.join(chunks)
+        return ''.join(chunks)
+
+
+class PDFRenderer(ShoppingCartRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    render_style = 'binary'
+
+    def stream(self, ingredients, user):
+        # Кэш документов ведётся по списку покупок пользователя
+        if user is None or not user.is_authenticated:
+            yield render_cart_pdf(ingredients)
+        else:
+            yield get_cart_pdf(user, ingredients)
+
+
+class CSVRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients, user):
+        writer = csv.writer(EchoBuffer())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for row in ingredients:
+            yield writer.writerow(row)
+
+
+class PlainTextRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients, user):
+        yield 'Foodgram\n_______________\nСписок покупок:\n'
+        for name, measurement_unit, amount in ingredients:
+            yield f'   - {name} - {amount} {measurement_unit}\n'
+
+
+class CartJSONRenderer(ShoppingCartRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, ingredients, user):
+        separator = '['
+        for name, measurement_unit, amount in ingredients:
+            yield separator + json.dumps({
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': amount,
+            }, ensure_ascii=False)
+            separator = ',\n'
+        yield ']' if separator == ',\n' else '[]'
@@ -0,0 +1,90 @@
+from hashlib import md5
+
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from foodgram.settings import RESPONSE_CACHE_TTL
+from recipes import versions
+
+STATS_KEYS = {
+    'hits': 'response_cache:hits',
+    'misses': 'response_cache:misses',
+}
+# Наборы данных, из которых собирается ответ с рецептами
+SCOPES = (versions.RECIPES, versions.TAGS, versions.INGREDIENTS,
+          versions.PROFILES)
+
+
+def record(event):
+    key = STATS_KEYS[event]
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_stats():
+    stats = {event: cache.get(key, 0) for event, key in STATS_KEYS.items()}
+    total = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / total if total else 0.0
+    return stats
+
+
+def reset_stats():
+    cache.delete_many(STATS_KEYS.values())
+
+
+def normalize_query(query_params):
+    """Строка запроса без зависимости от порядка параметров и значений."""
+    return '&'.join(
+        f'{name}={value}'
+        for name, values in sorted(query_params.lists())
+        for value in sorted(values)
+    )
+
+
+class AnonymousResponseCacheMixin:
+    """Кэширует данные ответов list и retrieve для анонимов.
+
+    Ответ одинаков для всех анонимов, поэтому ключ - действие, адрес
+    и нормализованная строка запроса. В ключ входят версии рецептов,
+    тэгов, ингредиентов и профилей авторов: любое изменение переключает
+    все ключи, и устаревшие записи вытесняются по времени жизни.
+    """
+    cached_actions = ('list', 'retrieve')
+
+    def get_response_cache_key(self, request):
+        generations = versions.get_versions(*SCOPES)
+        raw = ':'.join((
+            self.action,
+            request.get_host(),
+            request.path,
+            normalize_query(request.query_params),
+            *(str(generations[scope][0]) for scope in SCOPES),
+        ))
+        return f'response:{md5(raw.encode()).hexdigest()}'
+
+    def cached(self, handler, request, *args, **kwargs):
+        if (request.method != 'GET' or request.user.is_authenticated
+                or self.action not in self.cached_actions):
+            return handler(request, *args, **kwargs)
+        key = self.get_response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            record('hits')
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        record('misses')
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, RESPONSE_CACHE_TTL)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(super().retrieve, request, *args, **kwargs)
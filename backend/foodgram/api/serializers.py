@@ -5,10 +5,14 @@ from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 
 from recipes import models
+from recipes.renditions import FORMATS, VARIANTS
 
 from . import fields
+from .relations import get_relations
 
 User = get_user_model()
+# Наибольшее число id в одном пакетном запросе
+BATCH_MAX_IDS = 100
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -38,9 +42,11 @@ class CustomUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     def get_is_subscribed(self, obj):
+        is_subscribed = getattr(obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
         request = self.context.get('request')
-        return (request.user.is_authenticated and
-                request.user.subscription.following.filter(id=obj.id).exists())
+        return obj.id in get_relations(request).following_ids
 
     class Meta:
         model = User
@@ -62,19 +68,25 @@ class RecipePassiveShortSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
+class IdListSerializer(serializers.Serializer):
+    """Список id для пакетного добавления в список и удаления из него"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BATCH_MAX_IDS
+    )
+
+
 class SubscriptionSerializer(CustomUserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(source='recipes.count',
-                                             read_only=True)
+    recipes_count = serializers.IntegerField(read_only=True)
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes_limit = request.query_params.get('recipes_limit', None)
-        if recipes_limit:
-            recipes = (models.Recipe.objects.
-                       filter(author=obj)[:int(recipes_limit)])
-        else:
-            recipes = models.Recipe.objects.filter(author=obj)
+        recipes = getattr(obj, 'latest_recipes', None)
+        if recipes is None:
+            recipes = models.Recipe.objects.latest_by_author(
+                [obj.id], self.context.get('recipes_limit')
+            )[obj.id]
         return RecipePassiveShortSerializer(recipes, many=True).data
 
     class Meta:
@@ -87,7 +99,6 @@ class SubscriptionSerializer(CustomUserSerializer):
             'recipes',
             'recipes_count',
         )
-        depth = 2
 
 
 class AmountOfIngredientSerializer(serializers.ModelSerializer):
@@ -128,21 +139,52 @@ class RecipePassiveSerializer(RecipePassiveShortSerializer):
     text = serializers.CharField(min_length=1, required=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    images = serializers.SerializerMethodField()
+
+    def to_representation(self, instance):
+        # Флаг подписки на автора посчитан в запросе рецептов
+        author_is_subscribed = getattr(instance, 'author_is_subscribed', None)
+        if author_is_subscribed is not None:
+            instance.author.is_subscribed = author_is_subscribed
+        return super().to_representation(instance)
 
     def get_is_favorited(self, obj):
+        is_favorited = getattr(obj, 'is_favorited', None)
+        if is_favorited is not None:
+            return is_favorited
         request = self.context.get('request')
-        return (request.user.is_authenticated and
-                request.user.favorite.recipe.filter(id=obj.id).exists())
+        return obj.id in get_relations(request).favorite_ids
 
     def get_is_in_shopping_cart(self, obj):
+        is_in_shopping_cart = getattr(obj, 'is_in_shopping_cart', None)
+        if is_in_shopping_cart is not None:
+            return is_in_shopping_cart
+        request = self.context.get('request')
+        return obj.id in get_relations(request).shopping_cart_ids
+
+    def get_images(self, obj):
+        """Ссылки на уменьшенные копии; пока копии нет - на оригинал."""
+        renditions = getattr(obj, 'ready_renditions', None)
+        if renditions is None:
+            renditions = obj.renditions.filter(
+                status=models.ImageRendition.READY
+            )
         request = self.context.get('request')
-        return (request.user.is_authenticated and
-                request.user.shoppingcart.recipe.filter(id=obj.id).exists())
+        original = request.build_absolute_uri(obj.image.url)
+        images = {
+            variant: dict.fromkeys(FORMATS, original) for variant in VARIANTS
+        }
+        for rendition in renditions:
+            if rendition.source == obj.image.name:
+                images[rendition.variant][rendition.format] = (
+                    request.build_absolute_uri(rendition.file.url)
+                )
+        return images
 
     class Meta:
         model = models.Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'name', 'image',
-                  'text', 'cooking_time',  'is_favorited',
+                  'images', 'text', 'cooking_time',  'is_favorited',
                   'is_in_shopping_cart')
 
 
@@ -156,7 +198,7 @@ class RecipeActiveSerializer(serializers.ModelSerializer):
         queryset=models.Tag.objects.all(),
         many=True,
     )
-    image = fields.Base64FileField()
+    image = fields.Base64ImageField()
 
     class Meta:
         model = models.Recipe
@@ -183,7 +225,7 @@ class RecipeActiveSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         ingredients_ids = []
-        for ingredient in data['ingredients']:
+        for ingredient in data.get('ingredients', ()):
             if ingredient['id'] in ingredients_ids:
                 raise serializers.ValidationError(
                     'Убедитесь, что ингридиенты для рецепта уникальны')
@@ -200,6 +242,52 @@ class RecipeActiveSerializer(serializers.ModelSerializer):
             ) for ingredient in ingredients
         )
 
+    def update_recipe_ingredients(self, recipe, ingredients):
+        """Применяет к ингредиентам рецепта только разницу со старыми.
+
+        Возвращает True, если состав изменился.
+        """
+        new_amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        to_update = []
+        to_delete = []
+        for amount_of_ingredient in recipe.ingredients.all():
+            new_amount = new_amounts.pop(
+                amount_of_ingredient.ingredient_id, None
+            )
+            if new_amount is None:
+                to_delete.append(amount_of_ingredient.id)
+            elif new_amount != amount_of_ingredient.amount:
+                amount_of_ingredient.amount = new_amount
+                to_update.append(amount_of_ingredient)
+        if to_delete:
+            models.AmountOfIngredient.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            models.AmountOfIngredient.objects.bulk_update(
+                to_update, ('amount',)
+            )
+        if new_amounts:
+            models.AmountOfIngredient.objects.bulk_create(
+                models.AmountOfIngredient(
+                    ingredient_id=ingredient_id,
+                    amount=amount,
+                    recipe=recipe
+                ) for ingredient_id, amount in new_amounts.items()
+            )
+        return bool(to_delete or to_update or new_amounts)
+
+    def update_recipe_tags(self, recipe, tags):
+        """Меняет только добавленные и убранные тэги; True - если были."""
+        old_ids = set(recipe.tags.values_list('pk', flat=True))
+        new_ids = {tag.pk for tag in tags}
+        if old_ids - new_ids:
+            recipe.tags.remove(*(old_ids - new_ids))
+        if new_ids - old_ids:
+            recipe.tags.add(*(new_ids - old_ids))
+        return old_ids != new_ids
+
     @atomic
     def create(self, validated_data):
         request = self.context.get('request')
@@ -210,23 +298,34 @@ class RecipeActiveSerializer(serializers.ModelSerializer):
             author=request.user)
         recipe.tags.set(tags)
         self.create_recipe_ingredients(recipe, ingredients)
+        models.Recipe.objects.filter(pk=recipe.pk).update_search_vector()
         return recipe
 
     @atomic
     def update(self, instance, validated_data):
-        instance.name = validated_data.get('name')
-        instance.text = validated_data.get('text')
-        instance.cooking_time = validated_data.get('cooking_time')
-        new_tags = validated_data.get('tags')
-        instance.tags.set(new_tags)
-        instance.ingredients.all().delete()
-        new_ingredients = validated_data.get('ingredients')
-        self.create_recipe_ingredients(instance, new_ingredients)
-        instance.image.storage.delete(instance.image.name)
-        image = validated_data.get('image')
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        image = validated_data.pop('image', None)
+        update_fields = []
+        for field, value in validated_data.items():
+            if getattr(instance, field) != value:
+                setattr(instance, field, value)
+                update_fields.append(field)
         if image:
-            instance.image = validated_data.get('image')
-        instance.save()
+            instance.image = image
+            update_fields.append('image')
+        tags_changed = (tags is not None
+                        and self.update_recipe_tags(instance, tags))
+        ingredients_changed = (
+            ingredients is not None
+            and self.update_recipe_ingredients(instance, ingredients)
+        )
+        if update_fields or tags_changed or ingredients_changed:
+            instance.save(update_fields=[*update_fields, 'modified'])
+        if ingredients_changed or {'name', 'text'} & set(update_fields):
+            models.Recipe.objects.filter(
+                pk=instance.pk
+            ).update_search_vector()
         return instance
 
     def to_representation(self, instance):
@@ -0,0 +1,22 @@
+from django.core.cache import cache
+
+from recipes import models, versions
+
+REGISTRY_KEY = 'tag_registry:{version}'
+
+
+def get_tag_ids():
+    """Возвращает {slug: id} всех тэгов.
+
+    Словарь хранится в общем кэше под номером версии тэгов из базы
+    (versions.TAGS): любое изменение тэгов - в админке, в другом воркере
+    или командой загрузки - меняет версию, и все процессы сразу читают
+    новый словарь.
+    """
+    version, _ = versions.get_versions(versions.TAGS)[versions.TAGS]
+    key = REGISTRY_KEY.format(version=version)
+    registry = cache.get(key)
+    if registry is None:
+        registry = dict(models.Tag.objects.values_list('slug', 'id'))
+        cache.set(key, registry, None)
+    return registry
@@ -0,0 +1,308 @@
+"""Число SQL-запросов на каждый маршрут API.
+
+Набор данных создаётся в тестовой базе, каждый запрос выполняется с
+пустым кэшем (худший случай) и откатывается, чтобы следующие сценарии
+видели те же данные.
+"""
+import base64
+from collections import namedtuple
+from io import BytesIO
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from djoser.urls import authtoken
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.urls import router_v1
+from recipes import models, versions
+
+ANONYMOUS = 'anonymous'
+AUTHENTICATED = 'authenticated'
+# Размеры страницы, на которых сравнивается число запросов
+PAGE_SIZES = (2, 8)
+PASSWORD = 'Budget-pass-12345'
+SKIPPED_METHODS = ('head', 'options', 'trace')
+
+Scenario = namedtuple(
+    'Scenario', 'route method kwargs query data label paged',
+    defaults=({}, {}, None, '', False)
+)
+
+
+def image_data():
+    buffer = BytesIO()
+    Image.new('RGB', (32, 32), (120, 80, 40)).save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+def seed(size):
+    """Создаёт size пользователей с рецептами, списками и подписками.
+
+    Первый пользователь - тот, от чьего имени идут запросы: в его
+    избранном и списке покупок все чужие рецепты, он подписан на всех,
+    кроме последнего пользователя.
+    """
+    users = [
+        models.User.objects.create_user(
+            username=f'budget{index}', email=f'budget{index}@example.com',
+            password=PASSWORD, first_name='Имя', last_name='Фамилия',
+        )
+        for index in range(size)
+    ]
+    tags = [
+        models.Tag.objects.create(name=f'Тэг {index}', slug=f'tag{index}',
+                                  color=f'#0000{index:02X}')
+        for index in range(3)
+    ]
+    ingredients = [
+        models.Ingredient.objects.create(name=f'Ингредиент {index}',
+                                         measurement_unit='г')
+        for index in range(size)
+    ]
+    recipes = []
+    for index in range(size * 2):
+        recipe = models.Recipe.objects.create(
+            author=users[index % size], name=f'Суп {index}',
+            text='Описание', cooking_time=10 + index,
+            image='recipes/budget.png',
+        )
+        recipe.tags.set((tags[index % 3], tags[(index + 1) % 3]))
+        models.AmountOfIngredient.objects.bulk_create(
+            models.AmountOfIngredient(
+                recipe=recipe, amount=index + 1,
+                ingredient=ingredients[(index + shift) % size],
+            )
+            for shift in range(3)
+        )
+        recipes.append(recipe)
+    main, stranger = users[0], users[-1]
+    foreign = [recipe for recipe in recipes if recipe.author != main]
+    main.favorite.recipe.add(*foreign)
+    main.shoppingcart.recipe.add(*foreign)
+    main.subscription.following.add(*users[1:-1])
+    models.Recipe.objects.update_search_vector()
+    # Версии меняются после фиксации, которой в тесте нет; строки версий
+    # создаются сразу, как в рабочей базе
+    versions.bump_now(versions.RECIPES, versions.TAGS, versions.INGREDIENTS,
+                      versions.USERS, versions.PROFILES)
+    return {
+        'main': main,
+        'token': Token.objects.create(user=main).key,
+        'stranger': stranger,
+        'followed': users[1],
+        'own_recipe': next(r for r in recipes if r.author == main),
+        'listed_recipe': foreign[0],
+        'tags': tags,
+        'ingredient': ingredients[0],
+    }
+
+
+def build_scenarios(data):
+    main = data['main']
+    own, listed = data['own_recipe'].pk, data['listed_recipe'].pk
+    stranger, followed = data['stranger'].pk, data['followed'].pk
+    tag_ids = [tag.pk for tag in data['tags']]
+    tag_slugs = [tag.slug for tag in data['tags']]
+    recipe = {
+        'name': 'Новый суп', 'text': 'Описание', 'cooking_time': 5,
+        'tags': tag_ids[:2],
+        'ingredients': [{'id': data['ingredient'].pk, 'amount': 3}],
+    }
+    user = {'email': 'new@example.com', 'username': 'newbudget',
+            'first_name': 'Имя', 'last_name': 'Фамилия'}
+    password = {'current_password': PASSWORD}
+    reset = {'uid': 'MQ', 'token': 'invalid-token'}
+    # Письма не отправляются: ссылки для них в настройках djoser не заданы
+    unknown = {'email': 'unknown@example.com'}
+    return [
+        Scenario('api-root', 'get'),
+        Scenario('tags-list', 'get'),
+        Scenario('tags-detail', 'get', {'pk': tag_ids[0]}),
+        Scenario('ingredients-list', 'get'),
+        Scenario('ingredients-list', 'get', query={'name': 'Ингр'},
+                 label='name'),
+        Scenario('ingredients-detail', 'get',
+                 {'pk': data['ingredient'].pk}),
+        Scenario('recipes-list', 'get', paged=True),
+        Scenario('recipes-list', 'get', query={'cursor': ''},
+                 label='cursor', paged=True),
+        Scenario('recipes-list', 'get', query={'tags': tag_slugs[:2]},
+                 label='tags', paged=True),
+        Scenario('recipes-list', 'get', query={'author': followed},
+                 label='author', paged=True),
+        Scenario('recipes-list', 'get', query={'search': 'Суп'},
+                 label='search', paged=True),
+        Scenario('recipes-list', 'get', query={'is_favorited': 1},
+                 label='is_favorited', paged=True),
+        Scenario('recipes-list', 'get',
+                 query={'is_in_shopping_cart': 1, 'tags': tag_slugs[0]},
+                 label='is_in_shopping_cart', paged=True),
+        Scenario('recipes-list', 'post',
+                 data={**recipe, 'image': image_data()}),
+        Scenario('recipes-detail', 'get', {'pk': listed}),
+        Scenario('recipes-detail', 'patch', {'pk': own}, data=recipe),
+        Scenario('recipes-detail', 'delete', {'pk': own}),
+        Scenario('recipes-favorite', 'post', {'pk': own}),
+        Scenario('recipes-favorite', 'delete', {'pk': listed}),
+        Scenario('recipes-favorite-batch', 'post', data={'ids': [own]}),
+        Scenario('recipes-favorite-batch', 'delete',
+                 data={'ids': [listed]}),
+        Scenario('recipes-shopping-cart', 'post', {'pk': own}),
+        Scenario('recipes-shopping-cart', 'delete', {'pk': listed}),
+        Scenario('recipes-shopping-cart-batch', 'post',
+                 data={'ids': [own]}),
+        Scenario('recipes-shopping-cart-batch', 'delete',
+                 data={'ids': [listed]}),
+        Scenario('recipes-download-shopping-cart', 'get'),
+        Scenario('users-list', 'get', paged=True),
+        Scenario('users-list', 'get', query={'cursor': ''},
+                 label='cursor', paged=True),
+        Scenario('users-list', 'post', data={**user, 'password': PASSWORD}),
+        Scenario('users-detail', 'get', {'id': followed}),
+        Scenario('users-detail', 'put', {'id': main.pk}, data=user),
+        Scenario('users-detail', 'patch', {'id': main.pk},
+                 data={'first_name': 'Другое'}),
+        Scenario('users-detail', 'delete', {'id': main.pk}, data=password),
+        Scenario('users-me', 'get'),
+        Scenario('users-me', 'put', data=user),
+        Scenario('users-me', 'patch', data={'first_name': 'Другое'}),
+        Scenario('users-me', 'delete', data=password),
+        Scenario('users-subscriptions', 'get', query={'recipes_limit': 2},
+                 paged=True),
+        Scenario('users-subscribe', 'post', {'id': stranger}),
+        Scenario('users-subscribe', 'delete', {'id': followed}),
+        Scenario('users-subscribe-batch', 'post', data={'ids': [stranger]}),
+        Scenario('users-subscribe-batch', 'delete',
+                 data={'ids': [followed]}),
+        Scenario('users-activation', 'post', data=reset),
+        Scenario('users-resend-activation', 'post', data=unknown),
+        Scenario('users-reset-password', 'post', data=unknown),
+        Scenario('users-reset-password-confirm', 'post',
+                 data={**reset, 'new_password': PASSWORD}),
+        Scenario('users-reset-username', 'post', data=unknown),
+        Scenario('users-reset-username-confirm', 'post',
+                 data={**reset, 'new_username': 'renamed'}),
+        Scenario('users-set-password', 'post',
+                 data={**password, 'new_password': f'{PASSWORD}!'}),
+        Scenario('users-set-username', 'post',
+                 data={**password, 'new_username': 'renamed'}),
+        Scenario('login', 'post',
+                 data={'email': main.email, 'password': PASSWORD}),
+        Scenario('logout', 'post'),
+    ]
+
+
+def view_methods(callback):
+    actions = getattr(callback, 'actions', None)
+    view_class = getattr(callback, 'cls', None) or callback.view_class
+    if actions is not None:
+        methods = actions
+    else:
+        methods = [method for method in view_class.http_method_names
+                   if hasattr(view_class, method)]
+    return {method for method in methods
+            if method in view_class.http_method_names
+            and method not in SKIPPED_METHODS}
+
+
+def registered_routes():
+    """Пары (имя маршрута, метод) роутера API и маршрутов авторизации."""
+    return {
+        (pattern.name, method)
+        for pattern in (*router_v1.urls, *authtoken.urlpatterns)
+        for method in view_methods(pattern.callback)
+    }
+
+
+def get_clients(data):
+    # Ошибка сервера - тоже результат сценария: её статус попадает
+    # в бюджет, а не обрывает замер остальных маршрутов
+    anonymous = APIClient(raise_request_exception=False)
+    authenticated = APIClient(raise_request_exception=False)
+    authenticated.credentials(HTTP_AUTHORIZATION=f'Token {data["token"]}')
+    return {ANONYMOUS: anonymous, AUTHENTICATED: authenticated}
+
+
+def scenario_key(scenario):
+    key = f'{scenario.method.upper()} {scenario.route}'
+    return f'{key} [{scenario.label}]' if scenario.label else key
+
+
+def count_queries(client, scenario, page_size=None):
+    """Выполняет сценарий и возвращает (статус ответа, число запросов)."""
+    query = dict(scenario.query)
+    if page_size is not None:
+        query['limit'] = page_size
+    url = reverse(f'api:{scenario.route}', kwargs=scenario.kwargs)
+    if query:
+        url = f'{url}?{urlencode(query, doseq=True)}'
+    cache.clear()
+    with transaction.atomic():
+        # Версии данных меняются после фиксации, она здесь не наступает:
+        # отложенные действия выполняются внутри замера
+        with CaptureQueriesContext(connection) as queries, \
+                TestCase.captureOnCommitCallbacks(execute=True):
+            response = getattr(client, scenario.method)(
+                url, scenario.data or None, format='json'
+            )
+            # Запросы потокового ответа выполняются при чтении тела
+            if response.streaming:
+                b''.join(response.streaming_content)
+        transaction.set_rollback(True)
+    return response.status_code, len(queries)
+
+
+def measure(scenarios, clients):
+    """Возвращает ({роль: {сценарий: замер}}, список ошибок роста).
+
+    Постраничные сценарии выполняются на каждом из PAGE_SIZES: число
+    запросов не должно расти вместе с размером страницы.
+    """
+    results = {role: {} for role in clients}
+    growth = []
+    for role, client in clients.items():
+        for scenario in scenarios:
+            key = scenario_key(scenario)
+            if not scenario.paged:
+                status, queries = count_queries(client, scenario)
+            else:
+                counts = [count_queries(client, scenario, page_size)
+                          for page_size in PAGE_SIZES]
+                status = counts[-1][0]
+                queries = max(count for _, count in counts)
+                if counts[-1][1] > counts[0][1]:
+                    growth.append(
+                        f'{role} {key}: запросов {counts[0][1]} на странице '
+                        f'из {PAGE_SIZES[0]} и {counts[-1][1]} на странице '
+                        f'из {PAGE_SIZES[-1]}'
+                    )
+            results[role][key] = {'status': status, 'queries': queries}
+    return results, growth
+
+
+def compare(results, budgets):
+    """Список превышений бюджета и изменившихся статусов ответа."""
+    errors = []
+    for role, measured in results.items():
+        for key, result in measured.items():
+            budget = budgets.get(role, {}).get(key)
+            if budget is None:
+                errors.append(f'{role} {key}: нет бюджета')
+            elif result['status'] != budget['status']:
+                errors.append(
+                    f'{role} {key}: статус {result["status"]}, '
+                    f'ожидался {budget["status"]}'
+                )
+            elif result['queries'] > budget['queries']:
+                errors.append(
+                    f'{role} {key}: запросов {result["queries"]}, '
+                    f'бюджет {budget["queries"]}'
+                )
+    return errors
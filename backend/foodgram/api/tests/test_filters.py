@@ -0,0 +1,48 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes import models, versions
+
+
+class TagFilterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = models.User.objects.create_user(
+            username='author', email='author@example.com',
+            password='author-password', first_name='Имя',
+            last_name='Фамилия',
+        )
+        cls.recipe = models.Recipe.objects.create(
+            author=author, name='Суп', text='Описание', cooking_time=10,
+            image='recipes/test.png',
+        )
+        cls.recipe.tags.add(models.Tag.objects.create(
+            name='Обед', slug='lunch', color='#00FF00'
+        ))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_names(self, slug):
+        response = self.client.get('/api/recipes/', {'tags': slug})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_tag_added_elsewhere(self):
+        self.assertEqual(self.get_names('lunch'), ['Суп'])
+        # Тэг добавлен другим процессом: сигналов здесь не было,
+        # в базе поменялась только версия тэгов
+        models.Tag.objects.bulk_create([models.Tag(
+            name='Ужин', slug='dinner', color='#0000FF'
+        )])
+        tag = models.Tag.objects.get(slug='dinner')
+        models.Recipe.tags.through.objects.create(recipe=self.recipe,
+                                                  tag=tag)
+        versions.bump_now(versions.TAGS)
+        self.assertEqual(self.get_names('dinner'), ['Суп'])
+
+    def test_unknown_tag(self):
+        response = self.client.get('/api/recipes/', {'tags': 'breakfast'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,39 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes import models, versions
+
+
+class IngredientSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        models.Ingredient.objects.create(name='Соль', measurement_unit='г')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def search(self, name, **headers):
+        return self.client.get('/api/ingredients/', {'name': name},
+                               **headers)
+
+    def names(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return [ingredient['name'] for ingredient in response.json()]
+
+    def test_prefix_before_substring(self):
+        models.Ingredient.objects.create(name='Морская соль',
+                                         measurement_unit='г')
+        self.assertEqual(self.names(self.search('сол')),
+                         ['Соль', 'Морская соль'])
+
+    def test_ingredient_added_elsewhere(self):
+        response = self.search('со')
+        self.assertEqual(self.names(response), ['Соль'])
+        # Ингредиент добавлен другим процессом: сигналов здесь не было,
+        # в базе поменялась только версия справочника
+        models.Ingredient.objects.bulk_create([models.Ingredient(
+            name='Сода', measurement_unit='г'
+        )])
+        versions.bump_now(versions.INGREDIENTS)
+        response = self.search('со', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(self.names(response), ['Сода', 'Соль'])
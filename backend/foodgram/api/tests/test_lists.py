@@ -0,0 +1,61 @@
+from threading import Barrier, Thread
+from unittest import skipUnless
+
+from django.db import connection, connections
+from django.test import TransactionTestCase
+
+from api import lists
+from recipes import models
+
+THREADS = 4
+
+
+@skipUnless(connection.features.has_select_for_update,
+            'Нужна СУБД с SELECT ... FOR UPDATE')
+class ConcurrentListEditTest(TransactionTestCase):
+    """Параллельные запросы к одному списку (двойной клик)."""
+
+    def setUp(self):
+        self.user = models.User.objects.create_user(
+            username='reader', email='reader@example.com',
+            password='reader-password', first_name='Имя',
+            last_name='Фамилия',
+        )
+        self.recipe = models.Recipe.objects.create(
+            author=self.user, name='Суп', text='Описание', cooking_time=10,
+            image='recipes/test.png',
+        )
+
+    def run_concurrently(self, method):
+        barrier = Barrier(THREADS)
+        statuses = []
+
+        def edit():
+            try:
+                editor = lists.favorites(
+                    models.User.objects.get(pk=self.user.pk)
+                )
+                barrier.wait()
+                [result] = getattr(editor, method)([self.recipe.pk])
+                statuses.append(result['status'])
+            finally:
+                connections.close_all()
+
+        threads = [Thread(target=edit) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.recipe.refresh_from_db()
+        return sorted(statuses)
+
+    def test_add(self):
+        self.assertEqual(self.run_concurrently('add'),
+                         [lists.ADDED] + [lists.ALREADY_ADDED] * (THREADS - 1))
+        self.assertEqual(self.recipe.favorites_count, 1)
+
+    def test_remove(self):
+        lists.favorites(self.user).add([self.recipe.pk])
+        self.assertEqual(self.run_concurrently('remove'),
+                         [lists.NOT_IN_LIST] * (THREADS - 1) + [lists.REMOVED])
+        self.assertEqual(self.recipe.favorites_count, 0)
@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes import models, versions
+
+
+class KeysetPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = models.User.objects.create_user(
+            username='author', email='author@example.com',
+            password='author-password', first_name='Имя',
+            last_name='Фамилия',
+        )
+        now = timezone.now()
+        # Рецепт с искомым словом в названии - самый старый
+        for index, name in enumerate(('Суп', 'Каша', 'Рагу')):
+            recipe = models.Recipe.objects.create(
+                author=author, name=name, text='Описание: Суп и каша',
+                cooking_time=10, image='recipes/test.png',
+            )
+            models.Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=now + timedelta(minutes=index)
+            )
+        models.Recipe.objects.update_search_vector()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def names(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_cursor_follows_pub_date(self):
+        response = self.client.get('/api/recipes/',
+                                   {'cursor': '', 'limit': 2})
+        self.assertEqual(self.names(response), ['Рагу', 'Каша'])
+        self.assertEqual(self.names(self.client.get(response.json()['next'])),
+                         ['Суп'])
+
+    def test_search_keeps_rank(self):
+        response = self.client.get('/api/recipes/', {'search': 'Суп'})
+        self.assertEqual(self.names(response)[0], 'Суп')
+
+    def test_cursor_with_search_is_rejected(self):
+        response = self.client.get('/api/recipes/',
+                                   {'search': 'Суп', 'cursor': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json())
+
+
+class ApproximateCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = models.User.objects.create_user(
+            username='author', email='author@example.com',
+            password='author-password', first_name='Имя',
+            last_name='Фамилия',
+        )
+        models.Recipe.objects.create(
+            author=cls.author, name='Суп', text='Описание', cooking_time=10,
+            image='recipes/test.png',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def count(self):
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(response.json()['count_is_exact'])
+        return response.json()['count']
+
+    def test_recipe_added_elsewhere(self):
+        self.assertEqual(self.count(), 1)
+        # Рецепт создан другим процессом: сигналов здесь не было,
+        # в базе поменялась только версия рецептов
+        models.Recipe.objects.bulk_create([models.Recipe(
+            author=self.author, name='Каша', text='Описание',
+            cooking_time=10, image='recipes/test.png',
+        )])
+        self.assertEqual(self.count(), 1)
+        versions.bump_now(versions.RECIPES)
+        self.assertEqual(self.count(), 2)
@@ -0,0 +1,68 @@
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from . import query_budgets
+
+BUDGETS_PATH = Path(query_budgets.__file__).with_name('query_budgets.json')
+# Пользователей в наборе данных, рецептов вдвое больше; нужно больше
+# наибольшего размера страницы
+SIZE = query_budgets.PAGE_SIZES[-1] + 4
+# QUERY_BUDGETS_UPDATE=1 записывает текущие значения как бюджеты
+UPDATE = os.getenv('QUERY_BUDGETS_UPDATE', '') == '1'
+MEDIA_ROOT = tempfile.mkdtemp()
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'query-budgets',
+    }
+}
+
+
+@override_settings(CACHES=CACHES, MEDIA_ROOT=MEDIA_ROOT)
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = query_budgets.seed(SIZE)
+        cls.scenarios = query_budgets.build_scenarios(cls.data)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_every_route_has_scenario(self):
+        covered = {(scenario.route, scenario.method)
+                   for scenario in self.scenarios}
+        routes = query_budgets.registered_routes()
+        self.assertEqual(sorted(routes - covered), [],
+                         'Маршруты без сценария')
+        self.assertEqual(sorted(covered - routes), [],
+                         'Сценарии без маршрута')
+
+    def test_queries_within_budget(self):
+        results, growth = query_budgets.measure(
+            self.scenarios, query_budgets.get_clients(self.data)
+        )
+        self.assertEqual(growth, [], 'Число запросов растёт со страницей')
+        budgets = json.loads(BUDGETS_PATH.read_text('utf-8'))
+        # Число запросов зависит от СУБД, бюджеты у каждой свои
+        vendor = connection.vendor
+        if UPDATE:
+            budgets[vendor] = results
+            BUDGETS_PATH.write_text(
+                json.dumps(budgets, ensure_ascii=False, indent=2,
+                           sort_keys=True) + '\n',
+                encoding='utf-8'
+            )
+            return
+        if vendor not in budgets:
+            self.skipTest(f'Нет бюджетов для {vendor}, запустите с '
+                          f'QUERY_BUDGETS_UPDATE=1')
+        errors = query_budgets.compare(results, budgets[vendor])
+        self.assertFalse(errors, '\n'.join(errors))
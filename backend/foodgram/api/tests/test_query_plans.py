@@ -0,0 +1,92 @@
+import re
+
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.filters import RecipeFilters
+from recipes import models
+
+from . import query_budgets
+
+# Промежуточные таблицы, которые нельзя читать полным просмотром
+THROUGH_TABLES = (
+    'recipes_recipe_tags',
+    'recipes_favorite_recipe',
+    'recipes_shoppingcart_recipe',
+    'recipes_subscription_following',
+)
+# Частые сочетания фильтров списка рецептов
+CASES = (
+    'is_favorited=1',
+    'is_favorited=0',
+    'is_in_shopping_cart=1',
+    'is_in_shopping_cart=0',
+    'tags={tag}',
+    'tags={tag}&tags={other_tag}',
+    'is_favorited=1&tags={tag}',
+    'is_in_shopping_cart=1&tags={tag}&tags={other_tag}',
+    'author={author}&tags={tag}',
+    'is_favorited=1&is_in_shopping_cart=1',
+)
+
+
+def full_scan_pattern(vendor, table, sql):
+    if vendor == 'postgresql':
+        return re.compile(rf'Seq Scan on {table}\b')
+    # SQLite называет таблицу в плане её псевдонимом из запроса, а Django
+    # даёт псевдонимы U0, U1 ... таблицам подзапросов
+    names = [table, *re.findall(rf'"{table}" (\w+)', sql)]
+    # SEARCH - поиск по индексу, SCAN - просмотр всей таблицы
+    # или всего индекса
+    return re.compile(rf'\bSCAN ({"|".join(names)})\b')
+
+
+class QueryPlanTest(TestCase):
+    """Частые фильтры списка рецептов читают промежуточные таблицы
+    по индексу."""
+
+    @classmethod
+    def setUpTestData(cls):
+        data = query_budgets.seed(query_budgets.PAGE_SIZES[-1] + 4)
+        cls.user = data['main']
+        cls.params = {'tag': data['tags'][0].slug,
+                      'other_tag': data['tags'][1].slug,
+                      'author': data['followed'].pk}
+
+    def get_queryset(self, query):
+        request = Request(APIRequestFactory().get(f'/api/recipes/?{query}'))
+        request.user = self.user
+        filterset = RecipeFilters(
+            data=QueryDict(query),
+            queryset=models.Recipe.objects.with_user_flags(self.user),
+            request=request,
+        )
+        self.assertTrue(filterset.is_valid(), filterset.errors)
+        return filterset.qs
+
+    def explain(self, queryset):
+        if connection.vendor != 'postgresql':
+            return queryset.explain()
+        # На маленьких таблицах планировщик и так выберет полный
+        # просмотр; проверяем, что индекс вообще применим
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+
+    def test_through_tables_use_index(self):
+        for case in CASES:
+            query = case.format(**self.params)
+            with self.subTest(query=query):
+                queryset = self.get_queryset(query)
+                sql = str(queryset.query)
+                plan = self.explain(queryset)
+                scanned = [
+                    table for table in THROUGH_TABLES
+                    if full_scan_pattern(connection.vendor, table,
+                                         sql).search(plan)
+                ]
+                self.assertEqual(scanned, [], plan)
@@ -0,0 +1,115 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes import models, versions
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+SAVE_RECIPE = 'UPDATE "recipes_recipe" SET'
+BUMP_VERSION = 'UPDATE "recipes_contentversion"'
+
+
+class RecipeUpdateWritesTest(TestCase):
+    """PATCH рецепта пишет в базу только то, что изменилось."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = models.User.objects.create_user(
+            username='author', email='author@example.com',
+            password='author-password', first_name='Имя',
+            last_name='Фамилия',
+        )
+        cls.tags = [
+            models.Tag.objects.create(name=f'Тэг {index}', slug=f'tag{index}',
+                                      color=f'#0000{index:02X}')
+            for index in range(2)
+        ]
+        cls.ingredients = [
+            models.Ingredient.objects.create(name=f'Ингредиент {index}',
+                                             measurement_unit='г')
+            for index in range(4)
+        ]
+        cls.recipe = models.Recipe.objects.create(
+            author=cls.author, name='Суп', text='Описание', cooking_time=10,
+            image='recipes/test.png',
+        )
+        cls.recipe.tags.set(cls.tags)
+        models.AmountOfIngredient.objects.bulk_create(
+            models.AmountOfIngredient(recipe=cls.recipe, amount=index + 1,
+                                      ingredient=ingredient)
+            for index, ingredient in enumerate(cls.ingredients[:3])
+        )
+        # Строка версии рецептов есть в любой рабочей базе
+        versions.bump_now(versions.RECIPES)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def composition(self, changes=None, drop=None):
+        """Текущий состав рецепта с новыми количествами {id: количество}."""
+        amounts = dict(self.recipe.ingredients.values_list('ingredient_id',
+                                                           'amount'))
+        amounts.pop(drop, None)
+        amounts.update(changes or {})
+        return [{'id': pk, 'amount': amount}
+                for pk, amount in amounts.items()]
+
+    def patch(self, data):
+        with CaptureQueriesContext(connection) as queries, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/recipes/{self.recipe.pk}/',
+                                         data, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [query['sql'] for query in queries.captured_queries
+                if query['sql'].lstrip().upper().startswith(WRITE_STATEMENTS)]
+
+    def assertWrites(self, writes, *expected):
+        """Сверяет записи с ожидаемыми началами запросов по порядку."""
+        if connection.vendor == 'postgresql' and expected:
+            # Поисковый вектор ведётся только в PostgreSQL; версия
+            # меняется после фиксации, то есть последней
+            expected = (*expected[:-1], 'UPDATE "recipes_recipe" SET "search_',
+                        expected[-1])
+        self.assertEqual(len(writes), len(expected), writes)
+        for sql, start in zip(writes, expected):
+            self.assertTrue(sql.startswith(start), (sql, start))
+
+    def test_name_only(self):
+        writes = self.patch({'name': 'Борщ'})
+        self.assertWrites(writes, SAVE_RECIPE, BUMP_VERSION)
+        self.assertNotIn('"text"', writes[0])
+
+    def test_noop(self):
+        writes = self.patch({
+            'name': 'Суп',
+            'cooking_time': 10,
+            'tags': [tag.pk for tag in self.tags],
+            'ingredients': self.composition(),
+        })
+        self.assertWrites(writes)
+
+    def test_single_amount(self):
+        writes = self.patch({'ingredients': self.composition(
+            {self.ingredients[0].pk: 50}
+        )})
+        self.assertWrites(writes, 'UPDATE "recipes_amountofingredient"',
+                          SAVE_RECIPE, BUMP_VERSION)
+        self.assertEqual(
+            self.recipe.ingredients.get(ingredient=self.ingredients[0]).amount,
+            50
+        )
+
+    def test_ingredient_swap(self):
+        writes = self.patch({'ingredients': self.composition(
+            {self.ingredients[3].pk: 5}, drop=self.ingredients[0].pk
+        )})
+        self.assertWrites(writes,
+                          'DELETE FROM "recipes_amountofingredient"',
+                          'INSERT INTO "recipes_amountofingredient"',
+                          SAVE_RECIPE, BUMP_VERSION)
+        self.assertCountEqual(
+            self.recipe.ingredients.values_list('ingredient_id', flat=True),
+            [ingredient.pk for ingredient in self.ingredients[1:]]
+        )
@@ -0,0 +1,50 @@
+from django.test import SimpleTestCase, TestCase
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+
+from api import renderers
+from recipes import models
+
+ROWS = (('Соль', 'г', 5), ('Вода, питьевая', 'мл', 200))
+
+
+class ShoppingCartRendererTest(SimpleTestCase):
+    def test_base_is_abstract(self):
+        with self.assertRaises(TypeError):
+            renderers.ShoppingCartRenderer()
+
+    def test_render_joins_stream(self):
+        for renderer_class in (renderers.CSVRenderer,
+                               renderers.PlainTextRenderer,
+                               renderers.CartJSONRenderer):
+            renderer = renderer_class()
+            with self.subTest(renderer=renderer.format):
+                self.assertEqual(renderer.render(ROWS),
+                                 ''.join(renderer.stream(ROWS, None)))
+
+    def test_json_is_valid(self):
+        response = Response(ROWS)
+        response.accepted_renderer = renderers.CartJSONRenderer()
+        response.accepted_media_type = 'application/json'
+        response.renderer_context = {}
+        self.assertEqual(response.render().content.decode(),
+                         '[{"name": "Соль", "measurement_unit": "г", '
+                         '"amount": 5},\n{"name": "Вода, питьевая", '
+                         '"measurement_unit": "мл", "amount": 200}]')
+
+
+class PDFRendererTest(TestCase):
+    def test_render_with_and_without_user(self):
+        user = models.User.objects.create_user(
+            username='buyer', email='buyer@example.com',
+            password='buyer-password', first_name='Имя',
+            last_name='Фамилия',
+        )
+        request = APIRequestFactory().get('/api/recipes/')
+        request.user = user
+        renderer = renderers.PDFRenderer()
+        for context in ({'request': request}, None):
+            with self.subTest(context=context):
+                document = renderer.render(iter(ROWS), 'application/pdf',
+                                           context)
+                self.assertTrue(document.startswith(b'%PDF'))
@@ -0,0 +1,45 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes import models
+
+
+class RecipeSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = models.User.objects.create_user(
+            username='author', email='author@example.com',
+            password='author-password', first_name='Имя',
+            last_name='Фамилия',
+        )
+        beet = models.Ingredient.objects.create(name='Свёкла',
+                                                measurement_unit='г')
+        for name, text in (('Борщ', 'Суп на обед'), ('Винегрет', 'Салат'),
+                           ('Суп гороховый', 'Описание')):
+            recipe = models.Recipe.objects.create(
+                author=author, name=name, text=text, cooking_time=10,
+                image='recipes/test.png',
+            )
+            models.AmountOfIngredient.objects.create(
+                recipe=recipe, ingredient=beet, amount=1
+            )
+        models.Recipe.objects.update_search_vector()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def names(self, query):
+        response = self.client.get('/api/recipes/', {'search': query})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_case_insensitive_cyrillic(self):
+        for query in ('суп', 'СУП', 'Суп'):
+            with self.subTest(query=query):
+                self.assertEqual(self.names(query),
+                                 ['Суп гороховый', 'Борщ'])
+
+    def test_ingredient_name(self):
+        self.assertEqual(len(self.names('свёкла')), 3)
@@ -1,53 +1,112 @@
 from django.contrib.auth import get_user_model
+from django.db.models import BooleanField, Value
 from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
-from recipes import models
+from recipes import models, versions
 
-from . import pagination, serializers
+from . import lists, pagination, renderers, serializers
+from .conditional import ConditionalGetMixin
 from .filters import RecipeFilters
+from .ingredient_index import get_version, ingredient_index
 from .methods import create_and_download_cart
 from .permissions import OwnerOrReadOnly
+from .relations import get_relations
+from .response_cache import AnonymousResponseCacheMixin
 
 User = get_user_model()
 
 
-def to_list(self, request, instance, list):
-    exist = list.filter(id=instance.id).exists()
+def to_list(self, request, instance, editor):
     if request.method == 'POST':
-        if (exist):
+        [result] = editor.add([instance.pk])
+        if result['status'] == lists.ALREADY_ADDED:
             raise ValidationError('Already in list')
-        list.add(instance)
+        get_relations(request).invalidate()
         serializer = self.get_serializer(instance)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     elif request.method == 'DELETE':
-        if (not exist):
+        [result] = editor.remove([instance.pk])
+        if result['status'] == lists.NOT_IN_LIST:
             raise ValidationError('No such objects in list')
-        list.remove(instance)
+        get_relations(request).invalidate()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+def to_list_batch(request, editor, ids):
+    if request.method == 'POST':
+        results = editor.add(ids)
+    elif request.method == 'DELETE':
+        results = editor.remove(ids)
+    get_relations(request).invalidate()
+    return Response({'results': results})
+
+
+def get_batch_ids(request):
+    serializer = serializers.IdListSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['ids']
+
+
+def scope_validators(scope):
+    version, modified = versions.get_versions(scope)[scope]
+    return (scope, version), modified
+
+
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для тэгов"""
     queryset = models.Tag.objects.all()
     serializer_class = serializers.TagSerializer
 
+    def get_validators(self):
+        return scope_validators(versions.TAGS)
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, AnonymousResponseCacheMixin,
+                    pagination.SelectablePaginationMixin,
+                    viewsets.ModelViewSet):
     """Вьюсет для рецептов"""
     queryset = models.Recipe.objects.all()
-    pagination_class = pagination.CustomPageNumberPagination
+    pagination_class = pagination.ApproximateCountPagination
+    keyset_pagination_class = pagination.RecipeKeysetPagination
     permission_classes = (OwnerOrReadOnly,)
     http_method_names = ('get', 'post', 'patch', 'delete', 'head', 'options')
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilters
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method in SAFE_METHODS:
+            queryset = queryset.with_user_flags(self.request.user)
+        return queryset
+
+    def get_validators(self):
+        pk = self.kwargs.get('pk')
+        if self.action != 'retrieve' or not str(pk).isdigit():
+            return None
+        state = models.Recipe.objects.filter(pk=pk).conditional_state(
+            self.request.user
+        ).first()
+        if state is None:
+            return None
+        scopes = versions.get_versions(versions.TAGS, versions.INGREDIENTS,
+                                       versions.PROFILES)
+        return (
+            (*state.values(), *scopes.values()),
+            self.anonymous_last_modified(
+                state['modified'],
+                *(modified for _, modified in scopes.values())
+            )
+        )
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return serializers.RecipePassiveSerializer
@@ -62,8 +121,19 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def favorite(self, request, pk=None):
         recipe = get_object_or_404(models.Recipe, pk=pk)
-        favorite = request.user.favorite.recipe
-        return to_list(self, request, recipe, favorite)
+        return to_list(self, request, recipe, lists.favorites(request.user))
+
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='favorite',
+        url_name='favorite-batch',
+        permission_classes=(permissions.IsAuthenticated,),
+        serializer_class=serializers.IdListSerializer
+    )
+    def favorite_batch(self, request):
+        ids = get_batch_ids(request)
+        return to_list_batch(request, lists.favorites(request.user), ids)
 
     @action(
         methods=['post', 'delete'],
@@ -73,32 +143,115 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def shopping_cart(self, request, pk=None):
         recipe = get_object_or_404(models.Recipe, pk=pk)
-        shopping_cart = request.user.shoppingcart.recipe
-        return to_list(self, request, recipe, shopping_cart)
+        return to_list(self, request, recipe,
+                       lists.shopping_cart(request.user))
+
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+        permission_classes=(permissions.IsAuthenticated,),
+        serializer_class=serializers.IdListSerializer
+    )
+    def shopping_cart_batch(self, request):
+        ids = get_batch_ids(request)
+        return to_list_batch(request, lists.shopping_cart(request.user), ids)
 
     @action(
         detail=False,
-        permission_classes=(permissions.IsAuthenticated,)
+        permission_classes=(permissions.IsAuthenticated,),
+        # PDF - для Accept: */*, JSON - раньше текста, чтобы клиенты
+        # с Accept: application/json, text/plain, */* получали JSON
+        renderer_classes=(
+            renderers.PDFRenderer,
+            renderers.CartJSONRenderer,
+            renderers.CSVRenderer,
+            renderers.PlainTextRenderer,
+        )
     )
     def download_shopping_cart(self, request):
-        return create_and_download_cart(request)
+        return create_and_download_cart(request, request.accepted_renderer)
 
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Ошибки выгрузки списка покупок отдаются обычным JSON
+        if (self.action == 'download_shopping_cart'
+                and isinstance(response, Response)):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+
+class IngredientViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для ингредиентов"""
     serializer_class = serializers.IngredientSerializer
 
+    @cached_property
+    def ingredients_version(self):
+        # Один раз на запрос: по этой версии считаются и ETag, и индекс
+        return get_version()
+
+    def get_validators(self):
+        version, modified = self.ingredients_version
+        return (versions.INGREDIENTS, version), modified
+
     def get_queryset(self):
         queryset = models.Ingredient.objects.all()
         name = self.request.query_params.get('name')
-        if name is not None:
-            queryset = queryset.filter(name__istartswith=name)
+        if self.action == 'list' and name is not None:
+            return ingredient_index.search(name, self.get_limit(),
+                                           self.ingredients_version)
         return queryset
 
+    def get_limit(self):
+        limit = self.request.query_params.get('limit')
+        if limit is None:
+            return None
+        if not limit.isdigit() or int(limit) < 1:
+            raise ValidationError({'limit': 'Ожидается целое число больше 0'})
+        return int(limit)
 
-class CustomUserViewSet(UserViewSet):
+
+class CustomUserViewSet(ConditionalGetMixin,
+                        pagination.SelectablePaginationMixin, UserViewSet):
     """Вьюсет для пользователя"""
-    pagination_class = pagination.CustomPageNumberPagination
+    pagination_class = pagination.ApproximateCountPagination
+
+    def get_validators(self):
+        if self.action == 'me':
+            user_id = self.request.user.id
+        elif self.action == 'retrieve':
+            user_id = self.kwargs.get('id')
+        else:
+            return None
+        if not str(user_id).isdigit():
+            return None
+        user_id = int(user_id)
+        version, modified = versions.get_versions(versions.USERS)[
+            versions.USERS
+        ]
+        is_subscribed = (
+            self.request.user.is_authenticated
+            and user_id in get_relations(self.request).following_ids
+        )
+        return ((user_id, version, modified, is_subscribed),
+                self.anonymous_last_modified(modified))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ('subscriptions', 'subscribe'):
+            context['recipes_limit'] = self.get_recipes_limit()
+        return context
+
+    def get_recipes_limit(self):
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return None
+        if not recipes_limit.isdigit():
+            raise ValidationError(
+                {'recipes_limit': 'Ожидается целое неотрицательное число'}
+            )
+        return int(recipes_limit)
 
     @action(
         detail=False,
@@ -106,12 +259,19 @@ class CustomUserViewSet(UserViewSet):
         serializer_class=serializers.SubscriptionSerializer
     )
     def subscriptions(self, request):
-        queryset = request.user.subscription.following.all()
+        queryset = request.user.subscription.following.annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        )
         page = self.paginate_queryset(queryset)
+        authors = list(queryset) if page is None else page
+        latest_recipes = models.Recipe.objects.latest_by_author(
+            [author.id for author in authors], self.get_recipes_limit()
+        )
+        for author in authors:
+            author.latest_recipes = latest_recipes[author.id]
+        serializer = self.get_serializer(authors, many=True)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
     @action(
@@ -122,7 +282,21 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscribe(self, request, id=None):
         following = get_object_or_404(User, pk=id)
-        subscription = request.user.subscription.following
         if (request.user == following):
             raise ValidationError('Can\'t interact with yourself')
-        return to_list(self, request, following, subscription)
+        return to_list(self, request, following,
+                       lists.subscriptions(request.user))
+
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='subscribe',
+        url_name='subscribe-batch',
+        permission_classes=(permissions.IsAuthenticated,),
+        serializer_class=serializers.IdListSerializer
+    )
+    def subscribe_batch(self, request):
+        ids = get_batch_ids(request)
+        if request.user.id in ids:
+            raise ValidationError('Can\'t interact with yourself')
+        return to_list_batch(request, lists.subscriptions(request.user), ids)
@@ -113,6 +113,31 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Cache
+# locmem - в памяти каждого процесса, file - в каталоге, общем для всех
+# воркеров gunicorn (кэш ответов, версии индексов и счётчиков)
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache') if CACHE_BACKEND == 'file'
+            else 'foodgram'
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+        },
+    }
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.0/topics/i18n/
 
@@ -135,6 +160,42 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Ограничения на загружаемые изображения рецептов
+RECIPE_IMAGE_MAX_BYTES = int(os.getenv('RECIPE_IMAGE_MAX_BYTES', 10 * 2 ** 20))
+RECIPE_IMAGE_MAX_SIDE = int(os.getenv('RECIPE_IMAGE_MAX_SIDE', 8000))
+RECIPE_IMAGE_MAX_PIXELS = int(os.getenv('RECIPE_IMAGE_MAX_PIXELS', 40_000_000))
+# Сколько секунд после записи файл изображения не удаляется очисткой,
+# даже если на него ещё не ссылается ни один рецепт
+RECIPE_IMAGE_SWEEP_GRACE = int(os.getenv('RECIPE_IMAGE_SWEEP_GRACE', 3600))
+
+# Количество готовых PDF со списком покупок, хранимых в памяти процесса
+SHOPPING_CART_CACHE_SIZE = int(os.getenv('SHOPPING_CART_CACHE_SIZE', 128))
+
+# Сообщения приложения api, в том числе попадания в кэш списков покупок
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api': {
+            'handlers': ['console'],
+            'level': os.getenv('API_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
+# Начиная с какой оценки планировщика число строк в выдаче не пересчитывается
+# точно, и сколько секунд хранится точное число строк неотфильтрованного списка
+APPROXIMATE_COUNT_THRESHOLD = int(
+    os.getenv('APPROXIMATE_COUNT_THRESHOLD', 10000)
+)
+COUNT_CACHE_TTL = int(os.getenv('COUNT_CACHE_TTL', 600))
+
+# Сколько секунд хранится ответ со списком или рецептом для анонимов
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 300))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
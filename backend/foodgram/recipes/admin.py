@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from . import models
+from . import models, versions
 from .forms import TagForm
 
 EMPTY = '-пусто-'
@@ -8,8 +8,11 @@ EMPTY = '-пусто-'
 
 @admin.register(models.User)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'first_name', 'last_name', 'email')
-    list_filter = ('first_name', 'email',)
+    list_display = ('pk', 'username', 'first_name', 'last_name', 'email',
+                    'recipes_count', 'followers_count')
+    list_filter = ('is_staff', 'is_active')
+    search_fields = ('^username', '^email')
+    show_full_result_count = False
     empty_value_display = EMPTY
 
 
@@ -17,21 +20,47 @@ class UserAdmin(admin.ModelAdmin):
 class TagAdmin(admin.ModelAdmin):
     form = TagForm
     list_display = ('pk', 'name', 'color', 'slug')
+    search_fields = ('name', 'slug')
     empty_value_display = EMPTY
 
 
 @admin.register(models.Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('pk', 'name', 'measurement_unit')
-    list_filter = ('name',)
+    search_fields = ('^name',)
+    show_full_result_count = False
     empty_value_display = EMPTY
 
 
 @admin.register(models.AmountOfIngredient)
 class AmountOfIngredientAdmin(admin.ModelAdmin):
     list_display = ('pk', 'ingredient', 'recipe', 'amount')
+    list_select_related = ('ingredient', 'recipe')
+    autocomplete_fields = ('ingredient', 'recipe')
+    search_fields = ('^recipe__name', '^ingredient__name')
+    show_full_result_count = False
     empty_value_display = EMPTY
 
+    # Ингредиенты входят в поисковый вектор и в ответ API рецепта
+    def refresh_recipes(self, recipe_ids):
+        recipes = models.Recipe.objects.filter(pk__in=recipe_ids)
+        recipes.update_search_vector()
+        recipes.touch()
+        versions.bump(versions.RECIPES)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self.refresh_recipes({obj.recipe_id, form.initial.get('recipe')})
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.refresh_recipes({obj.recipe_id})
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        self.refresh_recipes(recipe_ids)
+
 
 @admin.register(models.Recipe)
 class RecipeAdmin(admin.ModelAdmin):
@@ -39,27 +68,57 @@ class RecipeAdmin(admin.ModelAdmin):
         'pk', 'name', 'author',
         'fans'
         )
-    list_filter = ('name', 'author', 'tags')
+    list_filter = ('tags',)
+    list_select_related = ('author',)
+    search_fields = ('^name', '^author__username')
+    autocomplete_fields = ('author', 'tags')
+    show_full_result_count = False
     empty_value_display = EMPTY
 
-    @admin.display(empty_value=EMPTY)
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        models.Recipe.objects.filter(pk=obj.pk).update_search_vector()
+
+    @admin.display(empty_value=EMPTY, ordering='favorites_count')
     def fans(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
 
 
 @admin.register(models.Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user',)
+    list_select_related = ('user',)
+    search_fields = ('^user__username',)
+    autocomplete_fields = ('user', 'following')
+    show_full_result_count = False
     empty_value_display = EMPTY
 
 
 @admin.register(models.Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user',)
+    list_select_related = ('user',)
+    search_fields = ('^user__username',)
+    autocomplete_fields = ('user', 'recipe')
+    show_full_result_count = False
     empty_value_display = EMPTY
 
 
 @admin.register(models.ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', )
+    list_select_related = ('user',)
+    search_fields = ('^user__username',)
+    autocomplete_fields = ('user', 'recipe')
+    show_full_result_count = False
+    empty_value_display = EMPTY
+
+
+@admin.register(models.ImageRendition)
+class ImageRenditionAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'recipe', 'variant', 'format', 'status', 'updated')
+    list_filter = ('status', 'variant', 'format')
+    list_select_related = ('recipe',)
+    autocomplete_fields = ('recipe',)
+    show_full_result_count = False
     empty_value_display = EMPTY
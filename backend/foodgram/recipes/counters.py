@@ -0,0 +1,55 @@
+from collections import Counter
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from . import models
+
+# Денормализованные счётчики: модель и её поле, а также таблица и колонка,
+# по строкам которой счётчик пересчитывается с нуля.
+COUNTERS = (
+    (models.Recipe, 'favorites_count',
+     models.Favorite.recipe.through, 'recipe_id'),
+    (models.Recipe, 'shopping_carts_count',
+     models.ShoppingCart.recipe.through, 'recipe_id'),
+    (models.User, 'recipes_count',
+     models.Recipe, 'author_id'),
+    (models.User, 'followers_count',
+     models.Subscription.following.through, 'user_id'),
+)
+
+
+def change_counters(model, field, ids, sign=1):
+    """Прибавляет к счётчику каждой строки число её вхождений в ids.
+
+    Обновление идёт через F(), поэтому параллельные изменения
+    не затирают друг друга, а счётчик не опускается ниже нуля.
+    """
+    by_delta = {}
+    for pk, times in Counter(ids).items():
+        by_delta.setdefault(times * sign, []).append(pk)
+    for delta, pks in by_delta.items():
+        model.objects.filter(pk__in=pks).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
+
+
+def count_rows(source, group_by):
+    return Coalesce(Subquery(
+        source.objects.filter(**{group_by: OuterRef('pk')}).order_by().
+        values(group_by).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def reconcile(model, field, source, group_by, pks):
+    """Пересчитывает счётчик для пачки строк, возвращает число исправленных."""
+    drifted = list(
+        model.objects.filter(pk__in=pks).
+        annotate(actual=count_rows(source, group_by)).
+        exclude(**{field: F('actual')}).
+        only('pk', field)
+    )
+    for obj in drifted:
+        setattr(obj, field, obj.actual)
+    model.objects.bulk_update(drifted, (field,))
+    return len(drifted)
@@ -0,0 +1,301 @@
+"""Синтетический набор данных в масштабе боевой базы.
+
+Всё, что создаётся, определяется зерном: каждая пачка из CHUNK_SIZE строк
+получает свой генератор случайных чисел, поэтому результат не зависит от
+числа параллельных обработчиков. Первичные ключи назначаются заранее
+(база + номер строки), чтобы обработчикам не нужно было читать id
+созданных строк. Популярность авторов, рецептов, тэгов и ингредиентов
+распределена по закону Ципфа, размеры личных списков - по Парето.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from io import BytesIO
+from itertools import accumulate
+from random import Random
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image
+
+from . import models
+
+PRESETS = {
+    'tiny': {'users': 200, 'recipes': 1_000},
+    'small': {'users': 2_000, 'recipes': 20_000},
+    'medium': {'users': 20_000, 'recipes': 200_000},
+    'large': {'users': 50_000, 'recipes': 500_000},
+}
+CHUNK_SIZE = 1000
+ZIPF_EXPONENT = 1.1
+# Сколько тэгов и ингредиентов в рецепте
+TAGS_PER_RECIPE = (1, 3)
+INGREDIENTS_PER_RECIPE = (3, 10)
+# Размеры личных списков: (показатель Парето, масштаб, предел)
+FAVORITES = (1.2, 4, 1000)
+SHOPPING_CART = (2.0, 3, 50)
+SUBSCRIPTIONS = (1.4, 3, 500)
+# Сколько тэгов и ингредиентов должно быть в базе перед генерацией
+MIN_TAGS = 12
+MIN_INGREDIENTS = 2000
+# Даты публикаций и регистрации - за HISTORY_DAYS до HISTORY_END;
+# конец истории задан явно, чтобы набор не зависел от дня запуска
+HISTORY_END = datetime(2024, 1, 1, tzinfo=timezone.utc)
+HISTORY_DAYS = 3 * 365
+
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Сергей', 'Елена',
+               'Дмитрий', 'Наталья', 'Алексей', 'Татьяна', 'Михаил')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев',
+              'Петров', 'Соколов', 'Михайлов', 'Новиков', 'Фёдоров')
+DISHES = ('суп', 'салат', 'пирог', 'рагу', 'плов', 'омлет', 'запеканка',
+          'паста', 'каша', 'котлеты', 'блины', 'борщ', 'соус', 'десерт')
+STYLES = ('домашний', 'быстрый', 'праздничный', 'летний', 'пряный',
+          'бабушкин', 'постный', 'сытный', 'лёгкий', 'острый')
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+
+
+@dataclass(frozen=True)
+class Plan:
+    """Параметры генерации, общие для всех обработчиков."""
+    seed: int
+    users: int
+    recipes: int
+    prefix: str
+    password: str
+    image: str
+    user_base: int
+    recipe_base: int
+    favorite_base: int
+    shopping_cart_base: int
+    subscription_base: int
+    tag_ids: tuple
+    ingredient_ids: tuple
+    batch_size: int
+
+
+def chunks(total):
+    return [(start, min(start + CHUNK_SIZE, total))
+            for start in range(0, total, CHUNK_SIZE)]
+
+
+def chunk_random(plan, phase, start):
+    return Random(f'{plan.seed}:{phase}:{start}')
+
+
+@lru_cache(maxsize=None)
+def popularity(seed, name, size):
+    """Накопленные веса Ципфа для size объектов в случайном порядке.
+
+    Место объекта в рейтинге не связано с его номером, иначе самыми
+    популярными всегда были бы самые старые строки.
+    """
+    ranks = list(range(size))
+    Random(f'{seed}:{name}').shuffle(ranks)
+    return list(accumulate(1 / (rank + 1) ** ZIPF_EXPONENT
+                           for rank in ranks))
+
+
+def pick(rng, cum_weights, count=1):
+    """count номеров по накопленным весам, без повторов."""
+    total = cum_weights[-1]
+    return {bisect_left(cum_weights, rng.random() * total)
+            for _ in range(count)}
+
+
+def heavy_tail(rng, shape):
+    alpha, scale, limit = shape
+    return min(limit, int((rng.paretovariate(alpha) - 1) * scale))
+
+
+def placeholder_image():
+    """Сохраняет одно изображение, общее для всех рецептов набора."""
+    buffer = BytesIO()
+    Image.new('RGB', (640, 480), (230, 160, 90)).save(buffer, 'JPEG')
+    storage = models.Recipe._meta.get_field('image').storage
+    return storage.save('recipes/synthetic.jpg',
+                        ContentFile(buffer.getvalue()))
+
+
+def ensure_tags(seed):
+    """Добавляет синтетические тэги, если в базе их меньше MIN_TAGS."""
+    existing = models.Tag.objects.count()
+    rng = Random(f'{seed}:tags')
+    colors = set(models.Tag.objects.values_list('color', flat=True))
+    tags = []
+    for index in range(existing, MIN_TAGS):
+        color = f'#{rng.randrange(0x1000000):06X}'
+        while color in colors:
+            color = f'#{rng.randrange(0x1000000):06X}'
+        colors.add(color)
+        tags.append(models.Tag(name=f'Синтетический тэг {index}',
+                               slug=f'synthetic-{index}', color=color))
+    models.Tag.objects.bulk_create(tags)
+    return len(tags)
+
+
+def ensure_ingredients(seed, batch_size):
+    """Добавляет ингредиенты, если справочник меньше MIN_INGREDIENTS."""
+    existing = models.Ingredient.objects.count()
+    rng = Random(f'{seed}:ingredients')
+    models.Ingredient.objects.bulk_create(
+        (models.Ingredient(name=f'Синтетический ингредиент {index}',
+                           measurement_unit=rng.choice(UNITS))
+         for index in range(existing, MIN_INGREDIENTS)),
+        batch_size=batch_size
+    )
+    return max(0, MIN_INGREDIENTS - existing)
+
+
+@contextmanager
+def explicit_timestamps(model):
+    """Отключает auto_now и auto_now_add, чтобы записать свои даты."""
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False)
+              or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def create_users(plan, start, end):
+    """Пользователи и их личные списки без вызова User.save()."""
+    rng = chunk_random(plan, 'users', start)
+    users = []
+    for index in range(start, end):
+        users.append(models.User(
+            pk=plan.user_base + index,
+            username=f'{plan.prefix}{index}',
+            email=f'{plan.prefix}{index}@example.com',
+            password=plan.password,
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            date_joined=HISTORY_END - timedelta(
+                seconds=rng.randrange(HISTORY_DAYS * 86400)
+            ),
+        ))
+    models.User.objects.bulk_create(users, batch_size=plan.batch_size)
+    for model, base in ((models.Favorite, plan.favorite_base),
+                        (models.ShoppingCart, plan.shopping_cart_base),
+                        (models.Subscription, plan.subscription_base)):
+        model.objects.bulk_create(
+            (model(pk=base + index, user_id=plan.user_base + index)
+             for index in range(start, end)),
+            batch_size=plan.batch_size
+        )
+    return len(users)
+
+
+def create_recipes(plan, start, end):
+    """Рецепты с тэгами и ингредиентами; авторы и состав - по Ципфу."""
+    rng = chunk_random(plan, 'recipes', start)
+    authors = popularity(plan.seed, 'users', plan.users)
+    tags = popularity(plan.seed, 'tags', len(plan.tag_ids))
+    ingredients = popularity(plan.seed, 'ingredients',
+                             len(plan.ingredient_ids))
+    recipes, recipe_tags, amounts = [], [], []
+    for index in range(start, end):
+        recipe_id = plan.recipe_base + index
+        [author] = pick(rng, authors)
+        pub_date = HISTORY_END - timedelta(
+            seconds=rng.randrange(HISTORY_DAYS * 86400)
+        )
+        recipes.append(models.Recipe(
+            pk=recipe_id,
+            author_id=plan.user_base + author,
+            name=f'{rng.choice(STYLES).capitalize()} '
+                 f'{rng.choice(DISHES)} №{index}',
+            text=' '.join(rng.choices(DISHES + STYLES, k=rng.randint(5, 40))),
+            image=plan.image,
+            cooking_time=rng.randint(5, 180),
+            pub_date=pub_date,
+            modified=pub_date,
+        ))
+        recipe_tags.extend(
+            models.Recipe.tags.through(recipe_id=recipe_id,
+                                       tag_id=plan.tag_ids[tag])
+            for tag in pick(rng, tags, rng.randint(*TAGS_PER_RECIPE))
+        )
+        amounts.extend(
+            models.AmountOfIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=plan.ingredient_ids[ingredient],
+                amount=rng.randint(1, 500),
+            )
+            for ingredient in pick(rng, ingredients,
+                                   rng.randint(*INGREDIENTS_PER_RECIPE))
+        )
+    with explicit_timestamps(models.Recipe):
+        models.Recipe.objects.bulk_create(recipes,
+                                          batch_size=plan.batch_size)
+    models.Recipe.tags.through.objects.bulk_create(
+        recipe_tags, batch_size=plan.batch_size
+    )
+    models.AmountOfIngredient.objects.bulk_create(
+        amounts, batch_size=plan.batch_size
+    )
+    return len(recipes)
+
+
+def create_lists(plan, start, end):
+    """Избранное, списки покупок и подписки пользователей."""
+    rng = chunk_random(plan, 'lists', start)
+    recipes = popularity(plan.seed, 'recipes', plan.recipes)
+    authors = popularity(plan.seed, 'users', plan.users)
+    favorites, cart, following = [], [], []
+    for index in range(start, end):
+        favorites.extend(
+            models.Favorite.recipe.through(
+                favorite_id=plan.favorite_base + index,
+                recipe_id=plan.recipe_base + recipe,
+            )
+            for recipe in pick(rng, recipes, heavy_tail(rng, FAVORITES))
+        )
+        cart.extend(
+            models.ShoppingCart.recipe.through(
+                shoppingcart_id=plan.shopping_cart_base + index,
+                recipe_id=plan.recipe_base + recipe,
+            )
+            for recipe in pick(rng, recipes, heavy_tail(rng, SHOPPING_CART))
+        )
+        following.extend(
+            models.Subscription.following.through(
+                subscription_id=plan.subscription_base + index,
+                user_id=plan.user_base + author,
+            )
+            for author in pick(rng, authors, heavy_tail(rng, SUBSCRIPTIONS))
+            if author != index
+        )
+    for rows in (favorites, cart, following):
+        if rows:
+            type(rows[0]).objects.bulk_create(rows,
+                                              batch_size=plan.batch_size)
+    return end - start
+
+
+PHASES = (
+    ('пользователи', create_users, 'users'),
+    ('рецепты', create_recipes, 'recipes'),
+    ('списки', create_lists, 'users'),
+)
+
+_plan = None
+
+
+def init_worker(plan):
+    global _plan
+    _plan = plan
+
+
+def run_chunk(task):
+    """Выполняет одну пачку в своей транзакции (в обработчике пула)."""
+    phase, start, end = task
+    _, create, _ = PHASES[phase]
+    with transaction.atomic():
+        return create(_plan, start, end)
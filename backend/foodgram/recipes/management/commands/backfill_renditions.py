@@ -0,0 +1,49 @@
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.db.models import Count, Q
+
+from recipes import renditions
+from recipes.models import ImageRendition, Recipe
+
+
+def init_worker():
+    # Соединения родительского процесса нельзя делить с дочерними
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Ставит в очередь уменьшенные копии изображений для рецептов, '
+            'у которых их ещё нет, и разбирает очередь в пуле процессов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=cpu_count(),
+                            help='Количество процессов')
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Сколько задач процесс забирает за раз')
+
+    def handle(self, *args, **options):
+        expected = len(renditions.VARIANTS) * len(renditions.FORMATS)
+        recipes = Recipe.objects.annotate(
+            ready=Count('renditions',
+                        filter=Q(renditions__status=ImageRendition.READY))
+        ).filter(ready__lt=expected).order_by('pk')
+        enqueued = 0
+        for recipe in recipes.only('id', 'image').iterator():
+            renditions.enqueue(recipe)
+            enqueued += 1
+        self.stdout.write(f'Рецептов без копий: {enqueued}')
+        # Задачи раздаёт claim(), как и обработчикам process_renditions
+        connections.close_all()
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers > 1:
+            # SQLite допускает только одного пишущего
+            self.stderr.write('SQLite: очередь разбирает один процесс')
+            workers = 1
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=init_worker) as pool:
+            done = sum(pool.map(renditions.drain,
+                                [options['batch_size']] * workers))
+        self.stdout.write(f'Обработано копий: {done}')
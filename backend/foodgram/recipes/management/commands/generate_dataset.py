@@ -0,0 +1,138 @@
+import multiprocessing
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections
+from django.db.models import Max
+from django.utils import timezone
+
+from recipes import dataset, models, versions
+
+# Модели, которым первичные ключи назначаются заранее
+EXPLICIT_PK_MODELS = (models.User, models.Recipe, models.Favorite,
+                      models.ShoppingCart, models.Subscription)
+SEARCH_VECTOR_BATCH = 10_000
+
+
+def next_pk(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = ('Создаёт детерминированный синтетический набор данных: '
+            'пользователей, рецепты, избранное, списки покупок и подписки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--preset', choices=dataset.PRESETS,
+                            default='small', help='Размер набора')
+        parser.add_argument('--users', type=int,
+                            help='Количество пользователей вместо пресета')
+        parser.add_argument('--recipes', type=int,
+                            help='Количество рецептов вместо пресета')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно генератора')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Количество параллельных процессов')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Количество строк в одном INSERT')
+        parser.add_argument('--prefix', default='synthetic',
+                            help='Начало username созданных пользователей')
+        parser.add_argument('--password', default='synthetic-password',
+                            help='Пароль всех созданных пользователей')
+
+    def handle(self, *args, **options):
+        preset = dataset.PRESETS[options['preset']]
+        users = options['users'] or preset['users']
+        recipes = options['recipes'] or preset['recipes']
+        workers = options['workers']
+        if users < 2 or recipes < 1 or workers < 1:
+            raise CommandError('Нужны хотя бы 2 пользователя, 1 рецепт '
+                               'и 1 обработчик')
+        if models.User.objects.filter(
+            username__startswith=options['prefix']
+        ).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {options["prefix"]} уже есть, '
+                'укажите другой --prefix'
+            )
+        if connection.vendor == 'sqlite' and workers > 1:
+            # SQLite допускает только одного пишущего
+            self.stderr.write('SQLite: пачки выполняются в одном процессе')
+            workers = 1
+
+        dataset.ensure_tags(options['seed'])
+        dataset.ensure_ingredients(options['seed'], options['batch_size'])
+        plan = dataset.Plan(
+            seed=options['seed'],
+            users=users,
+            recipes=recipes,
+            prefix=options['prefix'],
+            password=make_password(options['password']),
+            image=dataset.placeholder_image(),
+            user_base=next_pk(models.User),
+            recipe_base=next_pk(models.Recipe),
+            favorite_base=next_pk(models.Favorite),
+            shopping_cart_base=next_pk(models.ShoppingCart),
+            subscription_base=next_pk(models.Subscription),
+            tag_ids=tuple(models.Tag.objects.order_by('pk').
+                          values_list('pk', flat=True)),
+            ingredient_ids=tuple(models.Ingredient.objects.order_by('pk').
+                                 values_list('pk', flat=True)),
+            batch_size=options['batch_size'],
+        )
+        started = timezone.now()
+        self.run(plan, workers)
+        self.finish(plan)
+        self.stdout.write(
+            f'Готово за {(timezone.now() - started).total_seconds():.0f} с: '
+            f'пользователей {users}, рецептов {recipes}'
+        )
+
+    def run(self, plan, workers):
+        sizes = {'users': plan.users, 'recipes': plan.recipes}
+        if workers == 1:
+            dataset.init_worker(plan)
+            pool = None
+            run = map
+        else:
+            # Обработчики открывают свои соединения с базой
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(
+                workers, initializer=dataset.init_worker, initargs=(plan,)
+            )
+            run = pool.imap_unordered
+        try:
+            for phase, (title, _, size) in enumerate(dataset.PHASES):
+                tasks = [(phase, start, end)
+                         for start, end in dataset.chunks(sizes[size])]
+                done = 0
+                for count in run(dataset.run_chunk, tasks):
+                    done += count
+                    self.stdout.write(f'{title}: {done}', ending='\r')
+                    self.stdout.flush()
+                self.stdout.write(f'{title}: {done}')
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    def finish(self, plan):
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), EXPLICIT_PK_MODELS
+            ):
+                cursor.execute(sql)
+        call_command('reconcile_counters', batch_size=plan.batch_size,
+                     stdout=self.stdout)
+        if models.Recipe.objects.is_postgresql():
+            for start in range(0, plan.recipes, SEARCH_VECTOR_BATCH):
+                models.Recipe.objects.filter(
+                    pk__gte=plan.recipe_base + start,
+                    pk__lt=plan.recipe_base + start + SEARCH_VECTOR_BATCH,
+                ).update_search_vector()
+            self.stdout.write('поисковые векторы обновлены')
+        # Данные записаны без сигналов, версии меняем сами
+        versions.bump(versions.RECIPES, versions.TAGS, versions.INGREDIENTS,
+                      versions.USERS, versions.PROFILES)
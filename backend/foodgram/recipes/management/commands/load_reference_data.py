@@ -0,0 +1,228 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes import models, versions
+from recipes.reference_data import Upsert, add_links, iter_json_array
+
+# Модели фикстуры, которые загружаются после пользователей,
+# тэгов и ингредиентов, потому что ссылаются на них
+DEPENDENT_MODELS = (
+    'recipes.recipe',
+    'recipes.amountofingredient',
+    'recipes.favorite',
+    'recipes.shoppingcart',
+    'recipes.subscription',
+)
+PERSONAL_LISTS = (
+    (models.Favorite, 'recipe', 'recipes.recipe'),
+    (models.ShoppingCart, 'recipe', 'recipes.recipe'),
+    (models.Subscription, 'following', 'recipes.user'),
+)
+USER_FIELDS = (
+    'password', 'last_login', 'is_superuser', 'is_staff', 'is_active',
+    'date_joined', 'email', 'first_name', 'last_name',
+)
+
+
+class Command(BaseCommand):
+    help = ('Загружает ингредиенты, тэги и фикстуру одной транзакцией, '
+            'обновляя существующие строки по естественным ключам')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ingredients',
+                            help='JSON-массив ингредиентов, например '
+                                 'data/ingredients.json')
+        parser.add_argument('--tags',
+                            help='JSON-массив тэгов, например data/tags.json')
+        parser.add_argument('--fixture',
+                            help='Фикстура в формате dumpdata, например '
+                                 'fixtures/mydata.json')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Количество строк в одной пачке')
+
+    def handle(self, *args, **options):
+        if not any(options[name] for name in ('ingredients', 'tags',
+                                              'fixture')):
+            raise CommandError(
+                'Укажите хотя бы один файл: --ingredients, --tags '
+                'или --fixture'
+            )
+        self.batch_size = options['batch_size']
+        try:
+            with transaction.atomic():
+                if options['ingredients']:
+                    self.load(self.ingredient_upsert(),
+                              options['ingredients'])
+                if options['tags']:
+                    self.load(self.tag_upsert(), options['tags'])
+                if options['fixture']:
+                    self.load_fixture(options['fixture'])
+                # Сигналы не срабатывали, версии для ETag меняем сами
+                versions.bump(versions.RECIPES, versions.TAGS,
+                              versions.INGREDIENTS, versions.USERS,
+                              versions.PROFILES)
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+
+    def upsert(self, model, key, fields):
+        return Upsert(model, key, fields, self.batch_size)
+
+    def ingredient_upsert(self):
+        return self.upsert(models.Ingredient, ('name', 'measurement_unit'),
+                           ())
+
+    def tag_upsert(self):
+        return self.upsert(models.Tag, ('slug',), ('name', 'color'))
+
+    def report(self, upsert):
+        self.stdout.write(
+            f'{upsert.model._meta.verbose_name_plural}: '
+            f'добавлено {upsert.inserted}, обновлено {upsert.updated}, '
+            f'без изменений {upsert.unchanged}'
+        )
+
+    def progress(self, message):
+        """Строка прогресса, которую перепишет следующая строка.
+
+        Только для терминала: в файле или логе возврат каретки склеил бы
+        прогресс с итогами.
+        """
+        if not self.stdout.isatty():
+            return
+        self.stdout.write(message, ending='\r')
+        self.stdout.flush()
+
+    def load(self, upsert, path):
+        for number, values in enumerate(iter_json_array(path), 1):
+            upsert.add(values)
+            if number % self.batch_size == 0:
+                self.progress(f'{upsert.model._meta.verbose_name_plural}: '
+                              f'{upsert.processed}')
+        upsert.flush()
+        self.report(upsert)
+
+    def load_fixture(self, path):
+        loaders = {
+            'recipes.user': self.upsert(models.User, ('username',),
+                                        USER_FIELDS),
+            'recipes.tag': self.tag_upsert(),
+            'recipes.ingredient': self.ingredient_upsert(),
+        }
+        # pk из фикстуры -> естественный ключ строки
+        keys = {model: {} for model in loaders}
+        dependent = {model: [] for model in DEPENDENT_MODELS}
+        skipped = 0
+        for number, obj in enumerate(iter_json_array(path), 1):
+            model = obj['model']
+            if model in loaders:
+                upsert = loaders[model]
+                keys[model][obj['pk']] = upsert.add({
+                    name: obj['fields'][name]
+                    for name in (*upsert.key, *upsert.fields)
+                })
+            elif model in dependent:
+                dependent[model].append(obj)
+            else:
+                # Служебные таблицы зависят от окружения и не переносятся
+                skipped += 1
+            if number % self.batch_size == 0:
+                self.progress(f'фикстура: {number}')
+        for upsert in loaders.values():
+            upsert.flush()
+            self.report(upsert)
+        self.create_personal_lists()
+
+        ids = {
+            model: {pk: loaders[model].ids[key]
+                    for pk, key in model_keys.items()}
+            for model, model_keys in keys.items()
+        }
+        recipes = self.load_recipes(dependent['recipes.recipe'], ids)
+        amounts = self.upsert(models.AmountOfIngredient,
+                              ('recipe_id', 'ingredient_id'), ('amount',))
+        for obj in dependent['recipes.amountofingredient']:
+            fields = obj['fields']
+            amounts.add({
+                'recipe_id': ids['recipes.recipe'][fields['recipe']],
+                'ingredient_id':
+                    ids['recipes.ingredient'][fields['ingredient']],
+                'amount': fields['amount'],
+            })
+        amounts.flush()
+        loaded_recipes = models.Recipe.objects.filter(
+            pk__in=ids['recipes.recipe'].values()
+        )
+        loaded_recipes.update_search_vector()
+        loaded_recipes.touch()
+        self.report(recipes)
+        self.report(amounts)
+        self.load_personal_lists(dependent, ids)
+        self.stdout.write(f'пропущено служебных объектов: {skipped}')
+        call_command('reconcile_counters', stdout=self.stdout)
+
+    def load_recipes(self, objects, ids):
+        recipes = self.upsert(
+            models.Recipe, ('author_id', 'name'),
+            ('image', 'text', 'cooking_time', 'pub_date')
+        )
+        keys = {}
+        for obj in objects:
+            fields = obj['fields']
+            values = {
+                'author_id': ids['recipes.user'][fields['author']],
+                'name': fields['name'],
+                'image': fields['image'],
+                'text': fields['text'],
+                'cooking_time': fields['cooking_time'],
+                'pub_date': fields['pub_date'],
+            }
+            keys[obj['pk']] = recipes.add(values)
+        recipes.flush()
+        ids['recipes.recipe'] = {pk: recipes.ids[key]
+                                 for pk, key in keys.items()}
+        through = models.Recipe.tags.through
+        added, existed = add_links(
+            through, 'recipe_id', 'tag_id',
+            ((ids['recipes.recipe'][obj['pk']], ids['recipes.tag'][tag])
+             for obj in objects for tag in obj['fields']['tags']),
+            self.batch_size
+        )
+        self.stdout.write(f'тэги рецептов: добавлено {added}, '
+                          f'без изменений {existed}')
+        return recipes
+
+    def create_personal_lists(self):
+        """Создаёт личные списки, которые обычно создаёт User.save()."""
+        for model, _, _ in PERSONAL_LISTS:
+            name = model._meta.model_name
+            missing = models.User.objects.filter(
+                **{f'{name}s__isnull': True}
+            ).values_list('pk', flat=True)
+            model.objects.bulk_create(
+                (model(user_id=pk) for pk in missing.iterator()),
+                batch_size=self.batch_size
+            )
+
+    def load_personal_lists(self, dependent, ids):
+        for model, field_name, target_model in PERSONAL_LISTS:
+            objects = dependent[model._meta.label_lower]
+            user_ids = [ids['recipes.user'][obj['fields']['user']]
+                        for obj in objects]
+            list_ids = dict(model.objects.filter(
+                user_id__in=user_ids
+            ).values_list('user_id', 'pk'))
+            field = model._meta.get_field(field_name)
+            added, existed = add_links(
+                field.remote_field.through,
+                f'{field.m2m_field_name()}_id',
+                f'{field.m2m_reverse_field_name()}_id',
+                ((list_ids[user_id], ids[target_model][target])
+                 for obj, user_id in zip(objects, user_ids)
+                 for target in obj['fields'][field_name]),
+                self.batch_size
+            )
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: добавлено связей '
+                f'{added}, без изменений {existed}'
+            )
@@ -0,0 +1,29 @@
+from time import sleep
+
+from django.core.management.base import BaseCommand
+
+from recipes import renditions
+
+
+class Command(BaseCommand):
+    help = ('Обработчик очереди уменьшенных копий изображений рецептов; '
+            'запускается отдельным процессом рядом с веб-сервером')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20,
+                            help='Сколько задач забирать за раз')
+        parser.add_argument('--sleep', type=float, default=2.0,
+                            help='Пауза в секундах, когда очередь пуста')
+        parser.add_argument('--once', action='store_true',
+                            help='Обработать очередь и завершиться')
+
+    def handle(self, *args, **options):
+        while True:
+            claimed = renditions.claim(options['batch_size'])
+            if claimed:
+                renditions.process(claimed)
+                self.stdout.write(f'Обработано копий: {len(claimed)}')
+                continue
+            if options['once']:
+                break
+            sleep(options['sleep'])
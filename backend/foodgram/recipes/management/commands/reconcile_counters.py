@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import COUNTERS, reconcile
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счётчики рецептов '
+            'и пользователей пачками и исправляет расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Количество строк в одной пачке')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, field, source, group_by in COUNTERS:
+            fixed = 0
+            last_pk = 0
+            while True:
+                pks = list(
+                    model.objects.filter(pk__gt=last_pk).order_by('pk').
+                    values_list('pk', flat=True)[:batch_size]
+                )
+                if not pks:
+                    break
+                with transaction.atomic():
+                    fixed += reconcile(model, field, source, group_by, pks)
+                last_pk = pks[-1]
+            self.stdout.write(
+                f'{model._meta.object_name}.{field}: исправлено {fixed}'
+            )
@@ -0,0 +1,69 @@
+from datetime import timedelta
+from itertools import chain
+from time import sleep
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.models import Recipe
+
+# Сколько имён файлов проверяется одним запросом
+CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = ('Удаляет файлы изображений рецептов, на которые не ссылается '
+            'ни один рецепт; запускается периодически, например из cron')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int,
+                            default=settings.RECIPE_IMAGE_SWEEP_GRACE,
+                            help='Не трогать файлы моложе стольких секунд')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет удалено')
+        parser.add_argument('--interval', type=float,
+                            help='Повторять очистку через столько секунд, '
+                                 'не завершаясь')
+
+    def handle(self, *args, **options):
+        while True:
+            self.sweep_all(options)
+            if options['interval'] is None:
+                break
+            sleep(options['interval'])
+
+    def sweep_all(self, options):
+        field = Recipe._meta.get_field('image')
+        storage = field.storage
+        directory = field.upload_to.rstrip('/')
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        checked = deleted = 0
+        chunk = []
+        for name in chain(storage.content_files(directory),
+                          storage.legacy_files(directory)):
+            checked += 1
+            if storage.get_modified_time(name) < cutoff:
+                chunk.append(name)
+            if len(chunk) >= CHUNK_SIZE:
+                deleted += self.sweep(storage, chunk, cutoff, options)
+                chunk = []
+        if chunk:
+            deleted += self.sweep(storage, chunk, cutoff, options)
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(f'Проверено файлов: {checked}, {verb}: {deleted}')
+
+    def sweep(self, storage, names, cutoff, options):
+        referenced = set(Recipe.objects.filter(image__in=names).
+                         values_list('image', flat=True))
+        deleted = 0
+        for name in names:
+            if name in referenced:
+                continue
+            # Файл мог быть загружен заново, пока шла проверка
+            if storage.get_modified_time(name) >= cutoff:
+                continue
+            if not options['dry_run']:
+                storage.delete(name)
+            deleted += 1
+        return deleted
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+# Индексы под поиск админки по началу строки (search_fields с '^'):
+# Django строит для PostgreSQL условие UPPER("колонка"::text) LIKE UPPER(%s),
+# которое может использовать только функциональный индекс с
+# text_pattern_ops. Индексы создаются без блокировки таблиц.
+INDEXES = (
+    ('recipes_recipe_name_upper_like', 'recipes_recipe', 'name'),
+    ('recipes_ingredient_name_upper_like', 'recipes_ingredient', 'name'),
+    ('recipes_user_username_upper_like', 'recipes_user', 'username'),
+    ('recipes_user_email_upper_like', 'recipes_user', 'email'),
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+            f'ON {table} (UPPER({column}::text) text_pattern_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0004_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
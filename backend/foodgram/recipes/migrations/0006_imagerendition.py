@@ -0,0 +1,40 @@
+# Generated by Django 3.2.14 on 2026-10-18 20:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('variant', models.CharField(max_length=20, verbose_name='Вариант')),
+                ('format', models.CharField(max_length=10, verbose_name='Формат')),
+                ('source', models.CharField(max_length=255, verbose_name='Исходное изображение')),
+                ('file', models.FileField(blank=True, upload_to='recipes/renditions/', verbose_name='Файл')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('processing', 'Обрабатывается'), ('ready', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попытки')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Копия изображения',
+                'verbose_name_plural': 'Копии изображений',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='imagerendition',
+            index=models.Index(fields=['status', 'updated'], name='rendition_queue_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='imagerendition',
+            unique_together={('recipe', 'variant', 'format')},
+        ),
+    ]
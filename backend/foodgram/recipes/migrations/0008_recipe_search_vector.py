@@ -0,0 +1,54 @@
+# Generated by Django 3.2.14 on 2026-10-18 20:43
+
+from django.db import migrations
+import recipes.search
+
+# Вектор и индекс ведутся только в PostgreSQL; на других СУБД поиск
+# работает запасным путём без индекса. Индекс строится без блокировки.
+FILL_SEARCH_VECTOR = """
+UPDATE recipes_recipe recipe SET search_vector =
+    setweight(to_tsvector('russian', COALESCE(recipe.name, '')), 'A')
+    || setweight(to_tsvector('russian', COALESCE(recipe.text, '')), 'B')
+    || setweight(to_tsvector('russian', COALESCE((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM recipes_amountofingredient amount
+        JOIN recipes_ingredient ingredient
+            ON ingredient.id = amount.ingredient_id
+        WHERE amount.recipe_id = recipe.id
+    ), '')), 'C')
+"""
+INDEX_NAME = 'recipes_recipe_search_vector_gin'
+
+
+def fill_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(FILL_SEARCH_VECTOR)
+    schema_editor.execute(
+        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} '
+        'ON recipes_recipe USING GIN (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0007_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=recipes.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(fill_search_vector, drop_search_index),
+    ]
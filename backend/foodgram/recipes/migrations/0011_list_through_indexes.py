@@ -0,0 +1,49 @@
+from django.db import migrations
+
+# Уникальные индексы промежуточных таблиц начинаются с id списка и
+# покрывают поиск «есть ли рецепт в списке». Обратные составные индексы
+# нужны запросам со стороны рецепта или автора: пересчёту счётчиков,
+# подписчикам автора, каскадному удалению. В PostgreSQL индексы
+# строятся без блокировки таблиц.
+INDEXES = (
+    ('recipes_favorite_recipe_recipe_list_idx',
+     'recipes_favorite_recipe', ('recipe_id', 'favorite_id')),
+    ('recipes_shoppingcart_recipe_recipe_list_idx',
+     'recipes_shoppingcart_recipe', ('recipe_id', 'shoppingcart_id')),
+    ('recipes_subscription_following_user_list_idx',
+     'recipes_subscription_following', ('user_id', 'subscription_id')),
+)
+
+
+def concurrently(schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return 'CONCURRENTLY '
+    return ''
+
+
+def create_indexes(apps, schema_editor):
+    for name, table, columns in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX {concurrently(schema_editor)}IF NOT EXISTS '
+            f'{name} ON {table} ({", ".join(columns)})'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    for name, _, _ in INDEXES:
+        schema_editor.execute(
+            f'DROP INDEX {concurrently(schema_editor)}IF EXISTS {name}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0010_content_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -1,6 +1,14 @@
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
+from django.db import connections, models
+from django.db.models import (Case, Exists, F, OuterRef, Prefetch, Subquery,
+                              Value, When, Window)
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils import timezone
+
+from .search import (SEARCH_CONFIG, CaseFold, SearchQuery, SearchRank,
+                     SearchVector, SearchVectorField, StringAgg)
+from .storage import ContentAddressedStorage
 
 
 class PersonalList(models.Model):
@@ -96,6 +104,16 @@ class User(AbstractUser):
         'last name',
         max_length=150,
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False,
+    )
     REQUIRED_FIELDS = ['email', 'first_name', 'last_name']
 
     class Meta:
@@ -176,6 +194,159 @@ class Ingredient(models.Model):
         return self.name
 
 
+def user_flag_subqueries(user, recipe, author):
+    """Подзапросы EXISTS для флагов пользователя.
+
+    recipe и author - выражения с id рецепта и автора во внешнем запросе.
+    Для анонимного пользователя все флаги ложны.
+    """
+    if not user.is_authenticated:
+        return (Value(False, output_field=models.BooleanField()),) * 3
+    return (
+        Exists(Favorite.recipe.through.objects.filter(
+            favorite__user_id=user.id, recipe_id=recipe
+        )),
+        Exists(ShoppingCart.recipe.through.objects.filter(
+            shoppingcart__user_id=user.id, recipe_id=recipe
+        )),
+        Exists(Subscription.following.through.objects.filter(
+            subscription__user_id=user.id, user_id=author
+        )),
+    )
+
+
+class RecipeQuerySet(models.QuerySet):
+    def with_user_flags(self, user):
+        """Помечает рецепты флагами текущего пользователя.
+
+        Флаги is_favorited, is_in_shopping_cart и author_is_subscribed
+        считаются подзапросами EXISTS, автор присоединяется в том же SELECT,
+        а теги и ингредиенты подгружаются заранее - страница стоит
+        фиксированное число запросов.
+        """
+        is_favorited, is_in_shopping_cart, author_is_subscribed = (
+            user_flag_subqueries(user, OuterRef('pk'), OuterRef('author_id'))
+        )
+        return self.defer('search_vector').select_related('author').annotate(
+            is_favorited=is_favorited,
+            is_in_shopping_cart=is_in_shopping_cart,
+            author_is_subscribed=author_is_subscribed,
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredients',
+                queryset=AmountOfIngredient.objects.select_related(
+                    'ingredient'
+                )
+            ),
+            Prefetch(
+                'renditions',
+                queryset=ImageRendition.objects.filter(
+                    status=ImageRendition.READY
+                ),
+                to_attr='ready_renditions'
+            ),
+        )
+
+    def latest_by_author(self, author_ids, limit=None):
+        """Возвращает последние рецепты каждого автора одним запросом.
+
+        С limit рецепты нумеруются оконной функцией ROW_NUMBER() в разрезе
+        автора, и из каждой группы берутся первые limit строк.
+        """
+        queryset = self.filter(author_id__in=author_ids).only(
+            'id', 'name', 'image', 'cooking_time', 'author_id'
+        )
+        if limit is None:
+            recipes = queryset.order_by('-pub_date', '-id')
+        else:
+            queryset = queryset.annotate(recipe_rank=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            )).order_by()
+            sql, params = queryset.query.sql_with_params()
+            recipes = self.model.objects.raw(
+                f'SELECT * FROM ({sql}) ranked '
+                'WHERE recipe_rank <= %s ORDER BY recipe_rank',
+                (*params, limit)
+            )
+        grouped = {author_id: [] for author_id in author_ids}
+        for recipe in recipes:
+            grouped[recipe.author_id].append(recipe)
+        return grouped
+
+    def conditional_state(self, user):
+        """Всё, от чего зависит ответ с рецептом, кроме версий справочников.
+
+        Нужно для ETag: время изменения рецепта и флаги пользователя.
+        """
+        is_favorited, is_in_shopping_cart, is_subscribed = (
+            user_flag_subqueries(user, OuterRef('pk'), OuterRef('author_id'))
+        )
+        return self.annotate(
+            is_favorited=is_favorited,
+            is_in_shopping_cart=is_in_shopping_cart,
+            is_subscribed=is_subscribed,
+        ).values('pk', 'modified', 'is_favorited', 'is_in_shopping_cart',
+                 'is_subscribed')
+
+    def touch(self):
+        """Отмечает рецепты изменёнными, например после смены связей."""
+        return self.update(modified=timezone.now())
+
+    def is_postgresql(self):
+        return connections[self.db].vendor == 'postgresql'
+
+    def update_search_vector(self):
+        """Пересчитывает поисковый вектор: название, описание, ингредиенты.
+
+        Вне PostgreSQL вектор не ведётся, и поиск идёт запасным путём.
+        """
+        if not self.is_postgresql():
+            return 0
+        ingredient_names = AmountOfIngredient.objects.filter(
+            recipe_id=OuterRef('pk')
+        ).order_by().values('recipe_id').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+        return self.update(search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+            + SearchVector(Coalesce(Subquery(ingredient_names), Value('')),
+                           weight='C', config=SEARCH_CONFIG)
+        ))
+
+    def search(self, query):
+        """Полнотекстовый поиск, самые релевантные рецепты - первыми."""
+        if self.is_postgresql():
+            search_query = SearchQuery(query, config=SEARCH_CONFIG,
+                                       search_type='websearch')
+            return self.filter(search_vector=search_query).annotate(
+                search_rank=SearchRank(F('search_vector'), search_query)
+            ).order_by('-search_rank', '-pub_date', '-id')
+        # Запасной путь без индекса: совпадение в названии важнее,
+        # чем в описании, а в описании - чем в ингредиентах. icontains
+        # на SQLite не различает регистр только латиницы, поэтому обе
+        # стороны приводятся к одному регистру
+        query = query.casefold()
+        in_ingredients = Exists(AmountOfIngredient.objects.annotate(
+            folded_name=CaseFold('ingredient__name')
+        ).filter(recipe_id=OuterRef('pk'), folded_name__contains=query))
+        search_rank = Case(
+            When(folded_name__contains=query, then=Value(3)),
+            When(folded_text__contains=query, then=Value(2)),
+            When(in_ingredients, then=Value(1)),
+            default=Value(0),
+            output_field=models.IntegerField(),
+        )
+        return self.alias(
+            folded_name=CaseFold('name'), folded_text=CaseFold('text')
+        ).annotate(search_rank=search_rank).filter(
+            search_rank__gt=0
+        ).order_by('-search_rank', '-pub_date', '-id')
+
+
 class Recipe(models.Model):
     """Класс, описывающий рецепт."""
     author = models.ForeignKey(
@@ -192,6 +363,7 @@ class Recipe(models.Model):
     image = models.FileField(
         'Изображение',
         upload_to='recipes/',
+        storage=ContentAddressedStorage(),
         blank=False,
     )
     text = models.TextField(
@@ -215,17 +387,37 @@ class Recipe(models.Model):
         'Дата и время публикации',
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False,
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        'В списках покупок',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+    modified = models.DateTimeField(
+        'Дата и время изменения',
+        auto_now=True,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-pub_date',)
-
-    def delete(self, *args, **kwargs):
-        deleted = self.pk
-        super().delete(*args, **kwargs)
-        if deleted:
-            self.image.storage.delete(self.image.name)
+        ordering = ('-pub_date', '-id')
+        indexes = (
+            # Сортировка ленты и постраничный вывод по курсору
+            models.Index(fields=('-pub_date', '-id'),
+                         name='recipe_pub_date_id_idx'),
+        )
 
     def __str__(self):
         return f'{self.name} ({self.pk})'
@@ -265,3 +457,72 @@ class AmountOfIngredient(models.Model):
     def __repr__(self):
         return (f'{self.ingredient.name} - {self.amount} ' +
                 f'{self.ingredient.measurement_unit}')
+
+
+class ImageRendition(models.Model):
+    """Уменьшенная копия изображения рецепта; строка - задача очереди."""
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (PROCESSING, 'Обрабатывается'),
+        (READY, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='renditions'
+    )
+    variant = models.CharField('Вариант', max_length=20)
+    format = models.CharField('Формат', max_length=10)
+    source = models.CharField('Исходное изображение', max_length=255)
+    file = models.FileField(
+        'Файл',
+        upload_to='recipes/renditions/',
+        blank=True,
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    updated = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Копия изображения'
+        verbose_name_plural = 'Копии изображений'
+        unique_together = ['recipe', 'variant', 'format']
+        indexes = [
+            models.Index(fields=('status', 'updated'),
+                         name='rendition_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.variant}.{self.format}'
+
+    def __repr__(self):
+        return f'{self.recipe_id}: {self.variant}.{self.format}'
+
+
+class ContentVersion(models.Model):
+    """Номер версии набора данных для условных запросов и кэша ответов.
+
+    Увеличивается при каждом изменении строк набора (см. versions.bump).
+    """
+    scope = models.CharField('Набор данных', max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField('Версия', default=0)
+    modified = models.DateTimeField('Изменено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
+
+    def __str__(self):
+        return f'{self.scope}: {self.version}'
@@ -0,0 +1,171 @@
+import json
+
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(path, chunk_size=CHUNK_SIZE):
+    """Отдаёт элементы JSON-массива из файла, не читая его целиком."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as file:
+        buffer, position, eof = '', 0, False
+        state = 'start'
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position == len(buffer):
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    raise ValueError(f'{path}: неожиданный конец файла')
+                buffer, position = chunk, 0
+                continue
+            char = buffer[position]
+            if state == 'start':
+                if char != '[':
+                    raise ValueError(f'{path}: ожидается JSON-массив')
+                position += 1
+                state = 'first'
+            elif char == ']' and state in ('first', 'next'):
+                return
+            elif state == 'next':
+                if char != ',':
+                    raise ValueError(f'{path}: ожидается «,» или «]»')
+                position += 1
+                state = 'value'
+            else:
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    item, end = None, None
+                # Элемент мог оборваться на границе куска - дочитываем
+                if (end is None or end == len(buffer)) and not eof:
+                    chunk = file.read(chunk_size)
+                    eof = not chunk
+                    buffer, position = buffer[position:] + chunk, 0
+                    continue
+                if end is None:
+                    raise ValueError(f'{path}: некорректный JSON')
+                yield item
+                position = end
+                state = 'next'
+
+
+class Upsert:
+    """Вставка и обновление строк пачками по естественному ключу.
+
+    Для каждой пачки существующие строки читаются одним запросом,
+    изменившиеся обновляются через bulk_update, новые добавляются
+    через bulk_create. Сигналы и save() моделей не вызываются.
+    """
+
+    def __init__(self, model, key, fields, batch_size):
+        self.model = model
+        self.key = key
+        self.fields = fields
+        self.batch_size = batch_size
+        self.to_python = {
+            name: model._meta.get_field(name).to_python
+            for name in (*key, *fields)
+        }
+        self.pending = {}
+        # Естественный ключ -> pk строки в базе
+        self.ids = {}
+        self.inserted = self.updated = self.unchanged = 0
+
+    @property
+    def processed(self):
+        return self.inserted + self.updated + self.unchanged
+
+    def add(self, values):
+        """Ставит строку в пачку и возвращает её естественный ключ."""
+        values = {
+            name: self.to_python[name](value)
+            for name, value in values.items()
+        }
+        key = tuple(values[name] for name in self.key)
+        self.pending[key] = values
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return key
+
+    def fetch(self, keys):
+        """Возвращает {ключ: (pk, значения полей)} для строк из базы."""
+        first = self.key[0]
+        rows = self.model.objects.filter(
+            **{f'{first}__in': {key[0] for key in keys}}
+        ).order_by().values_list('pk', *self.key, *self.fields)
+        found = {}
+        size = len(self.key)
+        for pk, *values in rows:
+            key = tuple(values[:size])
+            if key in keys:
+                found[key] = pk, values[size:]
+        return found
+
+    def flush(self):
+        if not self.pending:
+            return
+        rows, self.pending = self.pending, {}
+        existing = self.fetch(rows)
+        new, changed = [], []
+        for key, values in rows.items():
+            if key not in existing:
+                new.append(self.model(**values))
+                continue
+            pk, current = existing[key]
+            self.ids[key] = pk
+            if all(value == values[name]
+                   for name, value in zip(self.fields, current)):
+                self.unchanged += 1
+            else:
+                changed.append(self.model(pk=pk, **values))
+        if changed:
+            self.model.objects.bulk_update(changed, self.fields)
+            self.updated += len(changed)
+        if new:
+            self.insert(new, rows)
+
+    def insert(self, new, rows):
+        self.model.objects.bulk_create(new)
+        self.inserted += len(new)
+        keys = [tuple(getattr(obj, name) for name in self.key)
+                for obj in new]
+        if all(obj.pk for obj in new):
+            created = dict(zip(keys, (obj.pk for obj in new)))
+        else:
+            # Без RETURNING (SQLite) pk новых строк читаются отдельно
+            created = {key: pk
+                       for key, (pk, _) in self.fetch(set(keys)).items()}
+        self.ids.update(created)
+        # auto_now_add перезаписывается при вставке, возвращаем значения
+        auto_fields = [
+            name for name in self.fields
+            if getattr(self.model._meta.get_field(name), 'auto_now_add',
+                       False)
+        ]
+        if auto_fields:
+            self.model.objects.bulk_update(
+                [self.model(pk=pk, **{name: rows[key][name]
+                                      for name in auto_fields})
+                 for key, pk in created.items()],
+                auto_fields
+            )
+
+
+def add_links(through, source, target, pairs, batch_size):
+    """Добавляет недостающие связи M2M, возвращает (добавлено, было)."""
+    pairs = list(dict.fromkeys(pairs))
+    inserted = 0
+    for start in range(0, len(pairs), batch_size):
+        batch = pairs[start:start + batch_size]
+        existing = set(through.objects.filter(
+            **{f'{source}__in': {pair[0] for pair in batch},
+               f'{target}__in': {pair[1] for pair in batch}}
+        ).values_list(source, target))
+        missing = [pair for pair in batch if pair not in existing]
+        through.objects.bulk_create(
+            (through(**{source: pair[0], target: pair[1]})
+             for pair in missing),
+            ignore_conflicts=True
+        )
+        inserted += len(missing)
+    return inserted, len(pairs) - inserted
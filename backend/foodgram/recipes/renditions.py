@@ -0,0 +1,156 @@
+from datetime import timedelta
+from io import BytesIO
+from os.path import basename, splitext
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import versions
+from .models import ImageRendition, Recipe
+
+# Вариант -> наибольшие ширина и высота; пропорции сохраняются
+VARIANTS = {
+    'thumbnail': (320, 320),
+    'card': (640, 480),
+}
+# Формат -> имя формата Pillow, расширение файла и параметры сохранения
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True,
+                             'progressive': True}),
+}
+MAX_ATTEMPTS = 3
+# Задачи, которые обрабатываются дольше, считаются брошенными
+PROCESSING_TIMEOUT = timedelta(minutes=10)
+
+
+def enqueue(recipe):
+    """Ставит в очередь все копии текущего изображения рецепта."""
+    for variant in VARIANTS:
+        for image_format in FORMATS:
+            ImageRendition.objects.update_or_create(
+                recipe=recipe,
+                variant=variant,
+                format=image_format,
+                defaults={
+                    'source': recipe.image.name,
+                    'status': ImageRendition.PENDING,
+                    'attempts': 0,
+                },
+            )
+
+
+def claim(batch_size):
+    """Забирает из очереди пачку задач, не мешая другим обработчикам."""
+    stale = timezone.now() - PROCESSING_TIMEOUT
+    with transaction.atomic():
+        renditions = list(
+            ImageRendition.objects.select_for_update(skip_locked=True).
+            filter(Q(status=ImageRendition.PENDING)
+                   | Q(status=ImageRendition.PROCESSING, updated__lt=stale)).
+            order_by('updated')[:batch_size]
+        )
+        ImageRendition.objects.filter(
+            pk__in=[rendition.pk for rendition in renditions]
+        ).update(status=ImageRendition.PROCESSING, updated=timezone.now())
+    return renditions
+
+
+def render(image, variant, image_format):
+    pillow_format, _, options = FORMATS[image_format]
+    copy = image.copy()
+    copy.thumbnail(VARIANTS[variant], Image.LANCZOS)
+    if pillow_format == 'JPEG' and copy.mode != 'RGB':
+        background = Image.new('RGB', copy.size, 'white')
+        if copy.mode in ('RGBA', 'LA'):
+            background.paste(copy, mask=copy.getchannel('A'))
+        else:
+            background.paste(copy.convert('RGB'))
+        copy = background
+    buffer = BytesIO()
+    copy.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+def open_source(recipe):
+    """Открывает исходник, декодируя JPEG сразу в уменьшенном масштабе."""
+    with recipe.image.open('rb') as source:
+        image = Image.open(source)
+        image.draft('RGB', max(VARIANTS.values()))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        image = image.convert('RGBA')
+    return image
+
+
+def process(renditions):
+    """Рисует копии; исходник каждого рецепта открывается один раз."""
+    by_recipe = {}
+    for rendition in renditions:
+        by_recipe.setdefault(rendition.recipe_id, []).append(rendition)
+    recipes = Recipe.objects.only('id', 'image').in_bulk(by_recipe)
+    for recipe_id, recipe_renditions in by_recipe.items():
+        recipe = recipes.get(recipe_id)
+        if recipe is None:
+            continue
+        try:
+            image = open_source(recipe)
+        except (OSError, ValueError):
+            image = None
+        for rendition in recipe_renditions:
+            save_rendition(recipe, rendition, image)
+
+
+def save_rendition(recipe, rendition, image):
+    if rendition.source != recipe.image.name:
+        # Изображение сменилось, задача уже поставлена заново
+        return
+    try:
+        if image is None:
+            raise OSError('Cannot open source image')
+        content = render(image, rendition.variant, rendition.format)
+    except (OSError, ValueError):
+        attempts = rendition.attempts + 1
+        ImageRendition.objects.filter(pk=rendition.pk).update(
+            attempts=attempts,
+            status=(ImageRendition.FAILED if attempts >= MAX_ATTEMPTS
+                    else ImageRendition.PENDING),
+            updated=timezone.now(),
+        )
+        return
+    stem = splitext(basename(recipe.image.name))[0]
+    extension = FORMATS[rendition.format][1]
+    old_file = rendition.file.name
+    rendition.file.save(f'{stem}_{rendition.variant}.{extension}',
+                        ContentFile(content), save=False)
+    updated = ImageRendition.objects.filter(
+        pk=rendition.pk, source=rendition.source
+    ).update(file=rendition.file.name, status=ImageRendition.READY,
+             updated=timezone.now())
+    if not updated:
+        rendition.file.storage.delete(rendition.file.name)
+        return
+    # Ссылки на копии входят в ответ API рецепта
+    Recipe.objects.filter(pk=recipe.pk).touch()
+    versions.bump(versions.RECIPES)
+    if old_file and old_file != rendition.file.name:
+        rendition.file.storage.delete(old_file)
+
+
+def drain(batch_size):
+    """Забирает задачи через claim() и рисует их, пока очередь не опустеет.
+
+    Задачи делятся с обработчиками process_renditions, работающими
+    в то же время, так что одну копию не рисуют дважды.
+    """
+    done = 0
+    while True:
+        claimed = claim(batch_size)
+        if not claimed:
+            return done
+        process(claimed)
+        done += len(claimed)
@@ -0,0 +1,43 @@
+from django.db import models
+
+try:
+    from django.contrib.postgres.aggregates import StringAgg
+    from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                                SearchVector)
+    from django.contrib.postgres.search import \
+        SearchVectorField as BaseSearchVectorField
+except ImportError:
+    # Без psycopg2 доступен только запасной поиск, например на SQLite
+    StringAgg = SearchQuery = SearchRank = SearchVector = None
+    BaseSearchVectorField = models.TextField
+
+SEARCH_CONFIG = 'russian'
+# Имя функции Python str.casefold в соединениях SQLite
+SQLITE_CASEFOLD = 'py_casefold'
+
+
+def casefold(value):
+    return None if value is None else value.casefold()
+
+
+def register_casefold(connection):
+    """Добавляет в соединение SQLite функцию casefold."""
+    connection.connection.create_function(SQLITE_CASEFOLD, 1, casefold)
+
+
+class CaseFold(models.Func):
+    """Строка в едином регистре для поиска без учёта регистра.
+
+    LOWER в SQLite меняет регистр только латиницы, поэтому там
+    вызывается str.casefold (см. register_casefold).
+    """
+    function = 'LOWER'
+    output_field = models.TextField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection,
+                              function=SQLITE_CASEFOLD, **extra_context)
+
+
+class SearchVectorField(BaseSearchVectorField):
+    """tsvector в PostgreSQL; без psycopg2 - обычное текстовое поле."""
@@ -0,0 +1,171 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (m2m_changed, post_delete, post_init,
+                                      post_save, pre_delete)
+from django.dispatch import receiver
+
+from . import models, renditions, versions
+from .counters import change_counters
+from .search import register_casefold
+
+# Поля пользователя, которые видны в ответах API
+USER_PROFILE_FIELDS = ('email', 'username', 'first_name', 'last_name')
+# Поля рецепта, которых нет в ответах API
+RECIPE_SERVICE_FIELDS = frozenset(('favorites_count', 'shopping_carts_count',
+                                   'search_vector'))
+
+
+def track_m2m_counter(list_model, field_name, counter_field):
+    """Поддерживает счётчик на стороне объектов, которые добавляют в список.
+
+    Сигнал m2m_changed срабатывает при add/remove/clear/set с обеих сторон
+    связи; удаление самого списка (например, вместе с пользователем)
+    ловится через pre_delete.
+    """
+    field = list_model._meta.get_field(field_name)
+    through = field.remote_field.through
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    target_model = field.related_model
+    pending_attr = f'_pending_{counter_field}'
+
+    def linked_targets(instance, reverse, pk_set=None):
+        rows = through.objects.filter(
+            **{target if reverse else source: instance.pk}
+        )
+        if pk_set is not None:
+            rows = rows.filter(
+                **{f'{source if reverse else target}__in': pk_set}
+            )
+        return list(rows.values_list(f'{target}_id', flat=True))
+
+    def on_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+        if action == 'post_add' and pk_set:
+            ids = [instance.pk] * len(pk_set) if reverse else pk_set
+            change_counters(target_model, counter_field, ids)
+        elif action in ('pre_remove', 'pre_clear'):
+            setattr(instance, pending_attr,
+                    linked_targets(instance, reverse, pk_set))
+        elif action in ('post_remove', 'post_clear'):
+            ids = instance.__dict__.pop(pending_attr, ())
+            change_counters(target_model, counter_field, ids, sign=-1)
+
+    def on_list_deleted(sender, instance, **kwargs):
+        change_counters(target_model, counter_field,
+                        linked_targets(instance, reverse=False), sign=-1)
+
+    m2m_changed.connect(on_m2m_changed, sender=through, weak=False)
+    pre_delete.connect(on_list_deleted, sender=list_model, weak=False)
+
+
+track_m2m_counter(models.Favorite, 'recipe', 'favorites_count')
+track_m2m_counter(models.ShoppingCart, 'recipe', 'shopping_carts_count')
+track_m2m_counter(models.Subscription, 'following', 'followers_count')
+
+
+@receiver(post_init, sender=models.Recipe)
+def remember_loaded_values(sender, instance, **kwargs):
+    instance._loaded_author_id = instance.__dict__.get('author_id')
+    image = instance.__dict__.get('image')
+    instance._loaded_image = getattr(image, 'name', image)
+
+
+@receiver(post_save, sender=models.Recipe)
+def count_authored_recipe(sender, instance, created, **kwargs):
+    if created:
+        change_counters(models.User, 'recipes_count', (instance.author_id,))
+    elif instance._loaded_author_id not in (None, instance.author_id):
+        change_counters(models.User, 'recipes_count',
+                        (instance._loaded_author_id,), sign=-1)
+        change_counters(models.User, 'recipes_count', (instance.author_id,))
+    instance._loaded_author_id = instance.author_id
+
+
+@receiver(post_delete, sender=models.Recipe)
+def uncount_authored_recipe(sender, instance, **kwargs):
+    change_counters(models.User, 'recipes_count', (instance.author_id,),
+                    sign=-1)
+
+
+@receiver(post_save, sender=models.Recipe)
+def enqueue_renditions(sender, instance, created, **kwargs):
+    if 'image' not in instance.__dict__:
+        return
+    if created or instance.image.name != instance._loaded_image:
+        renditions.enqueue(instance)
+    instance._loaded_image = instance.image.name
+
+
+@receiver(post_save, sender=models.Ingredient)
+def update_recipes_search_vector(sender, instance, created, **kwargs):
+    if not created:
+        models.Recipe.objects.filter(
+            ingredients__ingredient=instance
+        ).update_search_vector()
+
+
+@receiver(post_save, sender=models.Recipe)
+def bump_recipes_version(sender, update_fields=None, **kwargs):
+    if update_fields and RECIPE_SERVICE_FIELDS.issuperset(update_fields):
+        return
+    versions.bump(versions.RECIPES)
+
+
+@receiver(post_delete, sender=models.Recipe)
+def bump_recipes_version_on_delete(sender, **kwargs):
+    versions.bump(versions.RECIPES)
+
+
+@receiver(m2m_changed, sender=models.Recipe.tags.through)
+def bump_recipes_version_on_tags(sender, action, **kwargs):
+    if action.startswith('post_'):
+        versions.bump(versions.RECIPES)
+
+
+@receiver((post_save, post_delete), sender=models.Tag)
+def bump_tags_version(sender, **kwargs):
+    versions.bump(versions.TAGS)
+
+
+@receiver((post_save, post_delete), sender=models.Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    versions.bump(versions.INGREDIENTS)
+
+
+def user_profile(instance):
+    return tuple(instance.__dict__.get(field)
+                 for field in USER_PROFILE_FIELDS)
+
+
+@receiver(post_init, sender=models.User)
+def remember_loaded_profile(sender, instance, **kwargs):
+    instance._loaded_profile = user_profile(instance)
+
+
+@receiver(post_save, sender=models.User)
+def bump_users_version(sender, instance, created, **kwargs):
+    """Регистрация меняет только состав пользователей; пароль, вход
+    и счётчики не видны в ответах и версий не меняют."""
+    profile = user_profile(instance)
+    if created:
+        versions.bump(versions.USERS)
+    elif profile != instance._loaded_profile:
+        versions.bump(versions.USERS, versions.PROFILES)
+    instance._loaded_profile = profile
+
+
+@receiver(post_delete, sender=models.User)
+def bump_users_version_on_delete(sender, **kwargs):
+    # Рецепты пользователя удаляются вместе с ним и меняют свою версию
+    versions.bump(versions.USERS)
+
+
+@receiver(post_delete, sender=models.ImageRendition)
+def delete_rendition_file(sender, instance, **kwargs):
+    if instance.file:
+        instance.file.storage.delete(instance.file.name)
+
+
+@receiver(connection_created)
+def add_sqlite_functions(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        register_casefold(connection)
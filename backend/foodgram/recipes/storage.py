@@ -0,0 +1,62 @@
+import os
+import posixpath
+import re
+from hashlib import sha256
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла - хэш его содержимого.
+
+    Одинаковые файлы получают одно имя и записываются на диск один раз.
+    Файлы без ссылок удаляет периодическая очистка (sweep_images), а не
+    удаление рецепта: так общий файл не пропадёт из-под параллельной
+    загрузки того же изображения. Файлы, загруженные до перехода на
+    хэши, лежат прямо в каталоге и очищаются так же.
+    """
+    SHARD_PATTERN = re.compile(r'^[0-9a-f]{2}$')
+    NAME_PATTERN = re.compile(r'^([0-9a-f]{64})(\.\w+)?$')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        extension = posixpath.splitext(name)[1].lower()
+        name = posixpath.join(posixpath.dirname(name), digest[:2],
+                              f'{digest}{extension}')
+        if self.exists(name):
+            # Свежее время изменения защищает файл от очистки, пока не
+            # зафиксирована транзакция, которая на него ссылается
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
+
+    def content_files(self, directory):
+        """Имена файлов с хэшем вместо имени в подкаталогах directory."""
+        if not self.exists(directory):
+            return
+        shards, _ = self.listdir(directory)
+        for shard in sorted(shards):
+            if not self.SHARD_PATTERN.match(shard):
+                continue
+            _, files = self.listdir(posixpath.join(directory, shard))
+            for file_name in sorted(files):
+                match = self.NAME_PATTERN.match(file_name)
+                if match and match.group(1).startswith(shard):
+                    yield posixpath.join(directory, shard, file_name)
+
+    def legacy_files(self, directory):
+        """Файлы прямо в directory, записанные под исходными именами."""
+        if not self.exists(directory):
+            return
+        _, files = self.listdir(directory)
+        for file_name in sorted(files):
+            yield posixpath.join(directory, file_name)
@@ -0,0 +1,26 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class LoadReferenceDataOutputTest(TestCase):
+    def setUp(self):
+        file, self.path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(file, 'w', encoding='utf-8') as ingredients:
+            json.dump([{'name': f'Ингредиент {index}',
+                        'measurement_unit': 'г'} for index in range(5)],
+                      ingredients, ensure_ascii=False)
+        self.addCleanup(os.remove, self.path)
+
+    def test_no_progress_outside_terminal(self):
+        output = StringIO()
+        call_command('load_reference_data', ingredients=self.path,
+                     batch_size=2, stdout=output)
+        self.assertEqual(
+            output.getvalue(),
+            'Ингридиенты: добавлено 5, обновлено 0, без изменений 0\n'
+        )
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from time import time
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from recipes import models
+
+MEDIA_ROOT = tempfile.mkdtemp()
+# Старше RECIPE_IMAGE_SWEEP_GRACE по умолчанию
+OLD = time() - 2 * 24 * 3600
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class SweepImagesTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.storage = models.Recipe._meta.get_field('image').storage
+        self.author = models.User.objects.create_user(
+            username='author', email='author@example.com',
+            password='author-password', first_name='Имя',
+            last_name='Фамилия',
+        )
+
+    def write(self, name, content, referenced=False, old=True):
+        name = self.storage.save(name, ContentFile(content))
+        if old:
+            os.utime(self.storage.path(name), (OLD, OLD))
+        if referenced:
+            models.Recipe.objects.create(
+                author=self.author, name='Суп', text='Описание',
+                cooking_time=10, image=name,
+            )
+        return name
+
+    def write_legacy(self, name, referenced=False):
+        # Записано до перехода на хэши: имя файла исходное
+        path = self.storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(name.encode())
+        os.utime(path, (OLD, OLD))
+        if referenced:
+            models.Recipe.objects.create(
+                author=self.author, name='Каша', text='Описание',
+                cooking_time=10, image=name,
+            )
+        return name
+
+    def test_sweep(self):
+        kept = [
+            self.write('recipes/used.png', b'used', referenced=True),
+            self.write('recipes/fresh.png', b'fresh', old=False),
+            self.write_legacy('recipes/legacy-used.png', referenced=True),
+            self.write_legacy('recipes/renditions/thumb.png'),
+        ]
+        removed = [
+            self.write('recipes/orphan.png', b'orphan'),
+            self.write_legacy('recipes/legacy-orphan.png'),
+        ]
+        output = StringIO()
+        call_command('sweep_images', '--dry-run', stdout=output)
+        self.assertIn('Будет удалено: 2', output.getvalue())
+        self.assertTrue(all(map(self.storage.exists, removed)))
+        call_command('sweep_images', stdout=StringIO())
+        for name in kept:
+            self.assertTrue(self.storage.exists(name), name)
+        for name in removed:
+            self.assertFalse(self.storage.exists(name), name)
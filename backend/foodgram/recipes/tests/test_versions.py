@@ -0,0 +1,77 @@
+from django.db import transaction
+from django.test import TestCase
+
+from recipes import models, versions
+
+
+class BumpTest(TestCase):
+    def setUp(self):
+        versions.bump_now(versions.TAGS)
+
+    def tags_version(self):
+        return versions.get_versions(versions.TAGS)[versions.TAGS][0]
+
+    def test_bump_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            models.Tag.objects.create(name='Обед', slug='lunch',
+                                      color='#00FF00')
+            # До фиксации строка версии не меняется и не блокируется
+            self.assertEqual(self.tags_version(), 1)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(self.tags_version(), 2)
+
+    def test_rollback_keeps_version(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(ValueError), transaction.atomic():
+                versions.bump(versions.TAGS)
+                raise ValueError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.tags_version(), 1)
+
+
+class UserVersionsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        versions.bump_now(versions.USERS, versions.PROFILES)
+        cls.user = models.User.objects.create_user(
+            username='cook', email='cook@example.com', password='password',
+            first_name='Имя', last_name='Фамилия',
+        )
+
+    def versions(self):
+        scopes = versions.get_versions(versions.USERS, versions.PROFILES)
+        return {scope: version for scope, (version, _) in scopes.items()}
+
+    def save(self, change, **kwargs):
+        user = models.User.objects.get(pk=self.user.pk)
+        change(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save(**kwargs)
+        return self.versions()
+
+    def test_signup_keeps_profiles(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            models.User.objects.create_user(
+                username='guest', email='guest@example.com',
+                password='password',
+            )
+        self.assertEqual(self.versions(),
+                         {versions.USERS: 2, versions.PROFILES: 1})
+
+    def test_hidden_fields_keep_versions(self):
+        self.assertEqual(
+            self.save(lambda user: user.set_password('other-password')),
+            {versions.USERS: 1, versions.PROFILES: 1},
+        )
+        self.assertEqual(
+            self.save(lambda user: setattr(user, 'last_login', None),
+                      update_fields=['last_login']),
+            {versions.USERS: 1, versions.PROFILES: 1},
+        )
+
+    def test_name_change_bumps_profiles(self):
+        self.assertEqual(
+            self.save(lambda user: setattr(user, 'first_name', 'Другое')),
+            {versions.USERS: 2, versions.PROFILES: 2},
+        )
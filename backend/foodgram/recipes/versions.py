@@ -0,0 +1,56 @@
+from functools import partial
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ContentVersion
+
+RECIPES = 'recipes'
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+# Состав пользователей и их профили: список и страницы пользователей
+USERS = 'users'
+# Только поля профиля, которые видны в ответах с рецептами (автор)
+PROFILES = 'profiles'
+
+
+def bump(*scopes):
+    """Увеличивает версии наборов данных после фиксации транзакции.
+
+    UPDATE блокирует строку версии до конца транзакции, и все пишущие
+    в набор запросы выстраивались бы за ней в очередь. Поэтому версии
+    меняются отдельными короткими запросами после фиксации, а при
+    откате не меняются вовсе. Вне транзакции - сразу.
+    """
+    transaction.on_commit(partial(bump_now, *scopes))
+
+
+def bump_now(*scopes):
+    """Увеличивает версии наборов данных одним UPDATE на все наборы."""
+    now = timezone.now()
+    scopes = set(scopes)
+    changed = ContentVersion.objects.filter(scope__in=scopes)
+    if changed.update(version=F('version') + 1, modified=now) == len(scopes):
+        return
+    for scope in scopes - set(changed.values_list('scope', flat=True)):
+        try:
+            with transaction.atomic():
+                ContentVersion.objects.create(scope=scope, version=1)
+        except IntegrityError:
+            # Строку успел создать параллельный запрос
+            ContentVersion.objects.filter(scope=scope).update(
+                version=F('version') + 1, modified=now
+            )
+
+
+def get_versions(*scopes):
+    """Возвращает {набор: (версия, время изменения)} одним запросом."""
+    versions = dict.fromkeys(scopes, (0, None))
+    versions.update(
+        (scope, (version, modified))
+        for scope, version, modified in ContentVersion.objects.filter(
+            scope__in=scopes
+        ).values_list('scope', 'version', 'modified')
+    )
+    return versions